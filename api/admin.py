@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from api.models import User, Shop, Product, Category, Order, OrderItem, ProductInfo
+from api.models import User, Shop, Product, Category, Order, OrderItem, ProductInfo, ImportJob
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -33,4 +33,10 @@ class ShopAdmin(admin.ModelAdmin):
 
 @admin.register(OrderItem)
 class ShopAdmin(admin.ModelAdmin):
-    pass
\ No newline at end of file
+    pass
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'rows_processed', 'created_at', 'finished_at')
+    list_filter = ('status',)
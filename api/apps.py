@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from api.db import configure_sqlite
+
+        connection_created.connect(configure_sqlite, dispatch_uid='api.db.configure_sqlite')
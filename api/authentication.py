@@ -0,0 +1,165 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.models import User
+from api.tokens import TokenError, decode
+
+# Поля снимка пользователя: все, кроме хэша пароля, который при обращении догружается из базы
+SNAPSHOT_FIELDS = tuple(field.attname for field in User._meta.concrete_fields if field.attname != 'password')
+
+
+class LocalLRUCache:
+    """
+    Кэш процесса с вытеснением давно не использованных записей и временем жизни записи.
+
+    Записи других процессов не сбрасываются при инвалидации, поэтому время жизни держится коротким.
+    """
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local_cache = None
+
+
+def get_local_cache():
+    global _local_cache
+    if _local_cache is None:
+        options = settings.AUTH_TOKEN_CACHE
+        _local_cache = LocalLRUCache(options['LOCAL_MAX_ENTRIES'], options['LOCAL_TIMEOUT'])
+    return _local_cache
+
+
+def token_cache_key(key):
+    """
+    Ключ общего кэша. Токен хэшируется, чтобы в кэше не лежали действующие токены
+    """
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def shared_cache_timeout(cache):
+    """
+    Время жизни снимка в общем кэше. LocMemCache виден только своему процессу, и выход или смена пароля
+    не сбрасывают его записи в других процессах, поэтому для него срок не больше LOCAL_TIMEOUT
+    """
+    if isinstance(cache, LocMemCache):
+        local_timeout = settings.AUTH_TOKEN_CACHE['LOCAL_TIMEOUT']
+        return local_timeout if cache.default_timeout is None else min(cache.default_timeout, local_timeout)
+    return cache.default_timeout
+
+
+def user_snapshot(user):
+    return {name: getattr(user, name) for name in SNAPSHOT_FIELDS}
+
+
+def user_from_snapshot(snapshot):
+    """
+    Собирает пользователя из снимка без запроса к базе, пароль остается отложенным полем
+    """
+    return User.from_db(DEFAULT_DB_ALIAS, SNAPSHOT_FIELDS, [snapshot[name] for name in SNAPSHOT_FIELDS])
+
+
+def invalidate_token(key):
+    get_local_cache().delete(key)
+    caches[settings.AUTH_TOKEN_CACHE['CACHE']].delete(token_cache_key(key))
+
+
+def invalidate_user_tokens(user_id):
+    for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True):
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication со снимком пользователя в двух уровнях кэша.
+
+    Сначала проверяется LRU-кэш процесса, затем общий кэш AUTH_TOKEN_CACHE['CACHE'],
+    и только при промахе выполняется запрос Token + User. Записи сбрасываются при удалении токена (выход),
+    а также при любом сохранении пользователя: смене пароля, деактивации, изменении типа.
+    """
+
+    def authenticate_credentials(self, key):
+        local = get_local_cache()
+        snapshot = local.get(key)
+        if snapshot is None:
+            shared = caches[settings.AUTH_TOKEN_CACHE['CACHE']]
+            cache_key = token_cache_key(key)
+            snapshot = shared.get(cache_key)
+            if snapshot is None:
+                user, token = super().authenticate_credentials(key)
+                snapshot = user_snapshot(user)
+                shared.set(cache_key, snapshot, timeout=shared_cache_timeout(shared))
+                local.set(key, snapshot)
+                return user, token
+            local.set(key, snapshot)
+        return user_from_snapshot(snapshot), Token(key=key, user_id=snapshot['id'])
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Аутентификация по подписанному токену доступа из заголовка "Authorization: Bearer <токен>".
+
+    Подпись и срок действия проверяются без обращения к базе, пользователь собирается из данных токена,
+    остальные поля догружаются из базы только при обращении к ним.
+    Заголовки с другим ключевым словом пропускаются для следующих классов аутентификации.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed('Неверный заголовок Authorization')
+
+        try:
+            claims = decode(auth[1].decode(), 'access')
+        except (TokenError, UnicodeError) as error:
+            raise AuthenticationFailed(str(error))
+
+        user = User.from_db(DEFAULT_DB_ALIAS, ('id', 'email', 'type', 'is_staff', 'is_active'),
+                            [claims['sub'], claims['email'], claims['type'], claims['staff'], True])
+        return user, claims
+
+    def authenticate_header(self, request):
+        return self.keyword
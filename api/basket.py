@@ -0,0 +1,104 @@
+from functools import reduce
+from operator import or_
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api.models import Order, OrderItem, ProductInfo
+
+
+class BasketError(ValueError):
+    """
+    Ошибка в списке товаров корзины
+    """
+
+
+def parse_basket_items(items_json, with_quantity=True):
+    """
+    Проверяет список товаров корзины за один проход.
+
+    Args:
+        items_json (list): Товары в виде {'product': id, 'shop': id, 'quantity': количество}.
+        with_quantity (bool): Требовать положительное количество.
+
+    Returns:
+        dict: {(id продукта, id магазина): количество}.
+
+    Raises:
+        BasketError: Товар передан в неверном формате.
+    """
+    if not isinstance(items_json, list):
+        raise BasketError('items должен быть списком')
+
+    items = {}
+    for index, item in enumerate(items_json):
+        try:
+            key = (int(item['product']), int(item['shop']))
+            quantity = int(item['quantity']) if with_quantity else None
+        except (KeyError, TypeError, ValueError):
+            raise BasketError(f'Товар {index}: нужны целые product, shop' + (' и quantity' if with_quantity else ''))
+        if with_quantity and quantity <= 0:
+            raise BasketError(f'Товар {index}: quantity должно быть больше нуля')
+        items[key] = quantity
+    return items
+
+
+def items_filter(keys):
+    return reduce(or_, (Q(product_id=product_id, shop_id=shop_id) for product_id, shop_id in keys))
+
+
+def change_total(basket, delta):
+    """
+    Сдвигает сохраненную сумму заказа на delta без пересчета по всем позициям
+    """
+    if delta:
+        Order.objects.filter(id=basket.id).update(total_sum=F('total_sum') + delta, updated_at=timezone.now())
+
+
+def add_items(basket, items):
+    """
+    Добавляет товары в корзину одним bulk_create после проверки предложений магазинов одним запросом.
+    Цена позиции фиксируется на момент добавления по первому по id предложению магазина —
+    тому же, с которого api.stock.reserve_stock списывает товар при оформлении.
+    """
+    prices = {}
+    for product_id, shop_id, price in ProductInfo.objects.filter(items_filter(items), shop__status=True).order_by(
+            'id').values_list('product_id', 'shop_id', 'price'):
+        prices.setdefault((product_id, shop_id), price)
+    missing = [key for key in items if key not in prices]
+    if missing:
+        raise BasketError(f'Нет предложений магазинов для товаров {missing}')
+
+    OrderItem.objects.bulk_create([
+        OrderItem(order_id=basket.id, product_id=product_id, shop_id=shop_id, quantity=quantity,
+                  price=prices[(product_id, shop_id)])
+        for (product_id, shop_id), quantity in items.items()
+    ])
+    change_total(basket, sum(quantity * prices[key] for key, quantity in items.items()))
+    return len(items)
+
+
+def update_items(basket, items):
+    """
+    Меняет количество товаров корзины одним UPDATE ... CASE
+    """
+    order_items = list(OrderItem.objects.filter(items_filter(items), order_id=basket.id))
+    delta = 0
+    for order_item in order_items:
+        quantity = items[(order_item.product_id, order_item.shop_id)]
+        delta += (quantity - order_item.quantity) * order_item.price
+        order_item.quantity = quantity
+    updated = OrderItem.objects.bulk_update(order_items, ['quantity'])
+    change_total(basket, delta)
+    return updated
+
+
+def delete_items(basket, keys):
+    """
+    Удаляет товары корзины одним DELETE по id
+    """
+    order_items = list(OrderItem.objects.filter(items_filter(keys), order_id=basket.id).values_list(
+        'id', 'quantity', 'price'))
+    deleted = OrderItem.objects.filter(id__in=[order_item_id for order_item_id, _, _ in order_items]).delete()[0]
+    change_total(basket, -sum(quantity * price for _, quantity, price in order_items))
+    return deleted
@@ -0,0 +1,118 @@
+import hashlib
+
+from django.core.cache import caches
+from django.db.models import Count, Max, Sum
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.request import Request
+
+from api.models import Order, Shop
+
+
+def catalog_version(shop_id=None):
+    """
+    Версия каталога магазина или, без shop_id, всего каталога.
+
+    Версия магазина увеличивается при каждом импорте прайс-листа, изменении статуса магазина
+    и списании или возврате остатков заказами (api.stock),
+    версия всего каталога меняется вместе с версией любого магазина и при добавлении или удалении магазинов.
+    """
+    if shop_id is not None:
+        return Shop.objects.filter(id=shop_id).values_list('catalog_version', flat=True).first()
+    versions = Shop.objects.aggregate(version=Sum('catalog_version'), shops=Count('id'), last_id=Max('id'))
+    return f"{versions['version'] or 0}.{versions['shops']}.{versions['last_id'] or 0}"
+
+
+def catalog_cache_key(path, query, version, renderer_format):
+    params = '&'.join(f'{key}={value}' for key, values in sorted(query.lists()) for value in values)
+    digest = hashlib.md5(f'{path}?{params}'.encode()).hexdigest()
+    return f'catalog:{renderer_format}:{version}:{digest}'
+
+
+def orders_etag(request, *args, **kwargs):
+    """
+    ETag списка заказов пользователя по формату ответа, количеству заказов и времени последнего изменения.
+
+    Используется с django.views.decorators.http.condition, поэтому при совпадении If-None-Match
+    ответ 304 отдается до запроса заказов и сериализации. Формат, выбранный DRF по Accept, входит в ETag,
+    чтобы ETag страницы Browsable API не подходил к JSON-ответу.
+    """
+    if not request.user.is_authenticated:
+        return None
+    orders = Order.objects.filter(user_id=request.user.id).exclude(status='basket').aggregate(
+        count=Count('id'), updated_at=Max('updated_at'))
+    updated_at = orders['updated_at'].timestamp() if orders['updated_at'] else 0
+    return f"orders-{request.accepted_renderer.format}-{request.user.id}-{orders['count']}-{updated_at}"
+
+
+class CatalogCacheMixin:
+    """
+    Миксин, кэширующий GET-ответы представлений каталога в кэше 'catalog'.
+
+    Ключ строится из формата ответа, пути, параметров запроса (фильтры и курсор) и версии каталога,
+    поэтому после импорта или смены статуса магазина старые записи просто перестают запрашиваться
+    и вытесняются из кэша по LRU. Тот же ключ служит ETag ответа: при совпадении If-None-Match
+    отдается 304 без обращения к кэшу и сериализаторам.
+
+    Кэшируются только JSON-ответы: страница Browsable API зависит от пользователя. Формат выбирается
+    по заголовку Accept, поэтому все ответы помечаются Vary: Accept.
+
+    Версия и тело ответа читаются из основной базы, поэтому миксин не сочетается с ReplicaReadMixin:
+    тело, собранное по отстающей реплике, попало бы в кэш без срока жизни под уже новой версией.
+
+    Attributes:
+        - cache_shop_param: Параметр запроса с id магазина, сужающий версию до одного магазина
+    """
+    cache_alias = 'catalog'
+    cache_shop_param = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return super().dispatch(request, *args, **kwargs)
+        response = self.cached_dispatch(request, *args, **kwargs)
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+    def cached_dispatch(self, request, *args, **kwargs):
+        renderer_format = self.renderer_format(request)
+        if renderer_format != 'json':
+            return super().dispatch(request, *args, **kwargs)
+
+        shop_id = request.GET.get(self.cache_shop_param) if self.cache_shop_param else None
+        version = catalog_version(int(shop_id)) if shop_id and shop_id.isdigit() else catalog_version()
+        if version is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        key = catalog_cache_key(request.path, request.GET, version, renderer_format)
+        etag = quote_etag(key)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        cache = caches[self.cache_alias]
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['ETag'] = etag
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code == 200:
+            cache.set(key, (response.content, response['Content-Type']))
+            response['ETag'] = etag
+        return response
+
+    def renderer_format(self, request):
+        """
+        Формат, который DRF выберет для ответа по Accept и параметру format, или None, если подходящего нет
+        """
+        try:
+            renderer, _ = self.get_content_negotiator().select_renderer(Request(request), self.get_renderers())
+        except NotAcceptable:
+            return None
+        return renderer.format
@@ -0,0 +1,113 @@
+import random
+
+from asgiref.local import Local
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Обработчик connection_created: настраивает каждое новое соединение SQLite через PRAGMA из SQLITE_PRAGMAS.
+
+    WAL позволяет читать во время записи, synchronous=NORMAL в режиме WAL не теряет целостность
+    при сбое процесса, mmap ускоряет чтение, busy_timeout заставляет ждать блокировку вместо
+    немедленной ошибки "database is locked".
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+_routing = Local()
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+
+class ReplicaRouter:
+    """
+    Отправляет чтение на реплики, когда ReplicaReadMixin разрешил это для текущего запроса.
+
+    Запись, миграции, аутентификация и чтение вне представлений с ReplicaReadMixin
+    (обработчики импорта, рассылка писем, команды) всегда идут в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        if getattr(_routing, 'read_replica', False):
+            replicas = replica_aliases()
+            if replicas:
+                return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def pin_cache():
+    return caches[settings.REPLICA_PIN_CACHE]
+
+
+def pin_key(user_id):
+    return f'replica-pin-user:{user_id}'
+
+
+def is_pinned(user):
+    return user.is_authenticated and pin_cache().get(pin_key(user.pk)) is not None
+
+
+class ReplicaReadMixin:
+    """
+    Миксин APIView, читающий безопасные запросы (GET, HEAD, OPTIONS) с реплик.
+
+    Чтение переключается на реплику после аутентификации, поэтому токен, выданный только что,
+    проверяется по основной базе. Пользователь, закрепленный ReplicaPinningMiddleware
+    после записи, читает из основной базы.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and replica_aliases() and not is_pinned(request.user):
+            _routing.read_replica = True
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _routing.read_replica = False
+
+
+class ReplicaPinningMiddleware:
+    """
+    Закрепляет пользователя за основной базой на REPLICA_PIN_SECONDS после небезопасного запроса,
+    чтобы сразу после изменения корзины или заказа он видел свои записи, даже если реплика отстает.
+
+    Пользователь берется из запроса после ответа представления: DRF записывает аутентифицированного
+    пользователя и в исходный HttpRequest. Закрепления хранятся в кэше REPLICA_PIN_CACHE, который
+    должен быть общим для всех процессов, поэтому LocMemCache для него не принимается.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if replica_aliases() and isinstance(pin_cache(), LocMemCache):
+            raise ImproperlyConfigured('REPLICA_PIN_CACHE должен быть общим для процессов, LocMemCache не подходит')
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and replica_aliases():
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_cache().set(pin_key(user.pk), True, timeout=settings.REPLICA_PIN_SECONDS)
+        return response
@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+
+from api.models import ProductInfo
+from api.utils import chunked
+
+EXPORT_FIELDS = ('id', 'shop_id', 'shop__name', 'product_id', 'product__name', 'product__category_id',
+                 'product__category__name', 'external_id', 'model', 'name', 'price', 'price_rrc', 'quantity')
+EXPORT_COLUMNS = ('id', 'shop', 'shop_name', 'product', 'product_name', 'category', 'category_name',
+                  'external_id', 'model', 'name', 'price', 'price_rrc', 'quantity')
+
+
+def catalog_rows(shop_id=None, chunk_size=None):
+    """
+    Возвращает итератор кортежей EXPORT_FIELDS по товарам каталога без создания моделей.
+    Строки читаются с сервера курсором по chunk_size штук.
+    """
+    queryset = ProductInfo.objects.order_by('id')
+    if shop_id is not None:
+        queryset = queryset.filter(shop_id=shop_id)
+    return queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size or settings.CATALOG_EXPORT_CHUNK_SIZE)
+
+
+def ndjson_lines(rows, chunk_size):
+    """
+    NDJSON: первая строка {"columns": [...]}, далее по строке-массиву значений на товар
+    """
+    yield json.dumps({'columns': EXPORT_COLUMNS}) + '\n'
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    for batch in chunked(rows, chunk_size):
+        yield ''.join([dumps(row) + '\n' for row in batch])
+
+
+def csv_lines(rows, chunk_size):
+    """
+    CSV с заголовком EXPORT_COLUMNS
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in chunked(rows, chunk_size):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_lines, 'application/x-ndjson; charset=utf-8'),
+    'csv': (csv_lines, 'text/csv; charset=utf-8'),
+}
+
+
+def export_catalog(export_format, shop_id=None, chunk_size=None):
+    """
+    Выгружает каталог магазина или весь каталог по частям.
+
+    Память не зависит от размера каталога: строки читаются курсором через values_list().iterator()
+    и отдаются блоками по chunk_size товаров.
+
+    Args:
+        export_format (str): ndjson или csv.
+        shop_id (int): id магазина, None - весь каталог.
+        chunk_size (int): Количество товаров в одном блоке, по умолчанию CATALOG_EXPORT_CHUNK_SIZE.
+
+    Returns:
+        Iterator[str]: Блоки текста выгрузки.
+
+    Raises:
+        ValueError: Неизвестный формат.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Неизвестный формат {export_format}, доступны: {", ".join(EXPORT_FORMATS)}')
+    chunk_size = chunk_size or settings.CATALOG_EXPORT_CHUNK_SIZE
+    lines, _ = EXPORT_FORMATS[export_format]
+    return lines(catalog_rows(shop_id, chunk_size), chunk_size)
@@ -0,0 +1,104 @@
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from api.models import OrderItem, ProductParameter
+
+PRODUCT_INFO_VALUES = ('id', 'name', 'product__name', 'product__category__name', 'quantity', 'price')
+ORDER_VALUES = ('id', 'dt', 'updated_at', 'status', 'total_sum', 'user_id', 'contact_id')
+ORDER_ITEM_VALUES = ('id', 'quantity', 'price', 'order_id', 'product_id', 'shop_id')
+
+
+def _timezone():
+    return timezone.get_current_timezone() if settings.USE_TZ else None
+
+
+def _datetime(value, tz):
+    """
+    Дата со временем в том же виде, что и у serializers.DateTimeField
+    """
+    if not value:
+        return None
+    if tz is not None:
+        value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+    elif timezone.is_aware(value):
+        value = timezone.make_naive(value, datetime.timezone.utc)
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def product_parameters_data(product_info_ids):
+    """
+    Возвращает {id товара: список параметров как у ProductParameterSerializer} одним запросом
+    """
+    parameters = {product_info_id: [] for product_info_id in product_info_ids}
+    for product_info_id, name, value in ProductParameter.objects.filter(
+            product_info_id__in=parameters).order_by('id').values_list('product_info_id', 'parameter__name', 'value'):
+        parameters[product_info_id].append({'parameter': name, 'value': value})
+    return parameters
+
+
+def product_info_data(rows, parameters=None):
+    """
+    Список товаров как у ProductInfoSerializer(many=True).data по строкам PRODUCT_INFO_VALUES.
+    Параметры всех товаров читаются одним запросом, если не переданы в parameters.
+    """
+    rows = list(rows)
+    if parameters is None:
+        parameters = product_parameters_data([row['id'] for row in rows])
+    return [{
+        'name': row['name'],
+        'product': {'name': row['product__name'], 'category': row['product__category__name']},
+        'product_parameters': parameters.get(row['id'], []),
+        'quantity': row['quantity'],
+        'price': row['price'],
+    } for row in rows]
+
+
+def order_data(rows):
+    """
+    Список заказов как у OrderSerializer(many=True).data по строкам ORDER_VALUES
+    """
+    tz = _timezone()
+    return [{
+        'id': row['id'],
+        'dt': _datetime(row['dt'], tz),
+        'updated_at': _datetime(row['updated_at'], tz),
+        'status': row['status'],
+        'total_sum': row['total_sum'],
+        'user': row['user_id'],
+        'contact': row['contact_id'],
+    } for row in rows]
+
+
+def order_item_data(rows):
+    """
+    Список позиций как у OrderItemSerializer(many=True).data по строкам ORDER_ITEM_VALUES
+    """
+    return [{
+        'id': row['id'],
+        'quantity': row['quantity'],
+        'price': row['price'],
+        'order': row['order_id'],
+        'product': row['product_id'],
+        'shop': row['shop_id'],
+    } for row in rows]
+
+
+def shop_order_data(rows, shop_id):
+    """
+    Список заказов с позициями магазина как у ShopOrderSerializer(many=True).data по строкам ORDER_VALUES.
+    Позиции всех заказов читаются одним запросом.
+    """
+    rows = list(rows)
+    items = {row['id']: [] for row in rows}
+    for item in order_item_data(OrderItem.objects.filter(order_id__in=items, shop_id=shop_id).order_by(
+            'id').values(*ORDER_ITEM_VALUES)):
+        items[item['order']].append(item)
+
+    data = []
+    for order in order_data(rows):
+        order_id = order.pop('id')
+        data.append({'id': order_id, 'items': items[order_id], **order})
+    return data
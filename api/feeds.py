@@ -0,0 +1,257 @@
+import hashlib
+import threading
+import time
+from tempfile import SpooledTemporaryFile
+
+import requests as web_request
+import yaml
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from yaml import CSafeLoader as FeedLoader
+except ImportError:
+    from yaml import SafeLoader as FeedLoader
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def parse_feed(stream, loader_class=FeedLoader):
+    """
+    Потоково разбирает прайс-лист магазина.
+
+    Все ключи верхнего уровня до goods разбираются целиком, а товары из goods
+    строятся по событиям парсера по одному, поэтому в памяти находится только текущий товар.
+    Ключи после goods не читаются.
+
+    Args:
+        stream: Файлоподобный объект или строка с YAML.
+        loader_class: Класс загрузчика, по умолчанию CSafeLoader при наличии libyaml.
+
+    Returns:
+        tuple: Словарь ключей верхнего уровня и генератор товаров.
+    """
+    loader = loader_class(stream)
+    anchors = {}
+    loader.get_event()
+    loader.get_event()
+    if not loader.check_event(yaml.MappingStartEvent):
+        loader.dispose()
+        raise yaml.YAMLError('Прайс-лист должен быть словарем')
+    loader.get_event()
+
+    header = {}
+    while not loader.check_event(yaml.MappingEndEvent):
+        key = loader.construct_document(_compose(loader, anchors))
+        if key == 'goods':
+            return header, _iter_goods(loader, anchors)
+        header[key] = loader.construct_document(_compose(loader, anchors))
+    loader.dispose()
+    return header, iter(())
+
+
+def _iter_goods(loader, anchors):
+    try:
+        if not loader.check_event(yaml.SequenceStartEvent):
+            raise yaml.YAMLError('goods должен быть списком')
+        loader.get_event()
+        while not loader.check_event(yaml.SequenceEndEvent):
+            yield loader.construct_document(_compose(loader, anchors))
+    finally:
+        loader.dispose()
+
+
+def _compose(loader, anchors):
+    """
+    Собирает узел YAML из событий парсера, как это делает yaml.composer.Composer
+    """
+    event = loader.get_event()
+    if isinstance(event, yaml.AliasEvent):
+        return anchors[event.anchor]
+
+    if isinstance(event, yaml.ScalarEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(yaml.ScalarNode, event.value, event.implicit)
+        node = yaml.ScalarNode(tag, event.value, event.start_mark, event.end_mark, style=event.style)
+    elif isinstance(event, yaml.SequenceStartEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(yaml.SequenceNode, None, event.implicit)
+        node = yaml.SequenceNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        while not loader.check_event(yaml.SequenceEndEvent):
+            node.value.append(_compose(loader, anchors))
+        node.end_mark = loader.get_event().end_mark
+    elif isinstance(event, yaml.MappingStartEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(yaml.MappingNode, None, event.implicit)
+        node = yaml.MappingNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        while not loader.check_event(yaml.MappingEndEvent):
+            item_key = _compose(loader, anchors)
+            node.value.append((item_key, _compose(loader, anchors)))
+        node.end_mark = loader.get_event().end_mark
+    else:
+        raise yaml.YAMLError(f'Неожиданное событие {event}')
+
+    if event.anchor is not None:
+        anchors[event.anchor] = node
+    return node
+
+
+class FeedDownload:
+    """
+    Результат скачивания прайс-листа.
+
+    Attributes:
+        - body: Временный файл с телом ответа или None, если сервер ответил 304
+        - content_hash: SHA-256 тела ответа
+        - etag: Заголовок ETag ответа
+        - last_modified: Заголовок Last-Modified ответа
+        - size: Количество полученных байт
+        - seconds: Время скачивания
+    """
+
+    def __init__(self, body=None, content_hash='', etag='', last_modified='', size=0, seconds=0.0):
+        self.body = body
+        self.content_hash = content_hash
+        self.etag = etag
+        self.last_modified = last_modified
+        self.size = size
+        self.seconds = seconds
+
+    @property
+    def not_modified(self):
+        return self.body is None
+
+
+class FeedClient:
+    """
+    Клиент для скачивания прайс-листов с общим пулом соединений.
+
+    Соединения с хостами поставщиков переиспользуются между импортами, число соединений на хост
+    ограничено POOL_MAXSIZE, запросы ограничены таймаутами и повторяются с экспоненциальной задержкой.
+
+    Methods:
+        - download: Скачать прайс-лист условным запросом
+        - get_metrics: Суммарная статистика скачиваний процесса
+
+    Attributes:
+        - session: Сессия requests с пулом соединений
+    """
+
+    def __init__(self, connect_timeout=5, read_timeout=30, retries=3, backoff_factor=0.5,
+                 max_bytes=None, pool_connections=10, pool_maxsize=4):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_bytes = max_bytes
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=('GET',), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                              max_retries=retry, pool_block=True)
+        self.session = web_request.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._lock = threading.Lock()
+        self._metrics = {'downloads': 0, 'not_modified': 0, 'failed': 0, 'bytes': 0, 'seconds': 0.0}
+
+    @classmethod
+    def from_settings(cls):
+        options = settings.FEED_FETCH
+        return cls(connect_timeout=options['CONNECT_TIMEOUT'],
+                   read_timeout=options['READ_TIMEOUT'],
+                   retries=options['RETRIES'],
+                   backoff_factor=options['BACKOFF_FACTOR'],
+                   max_bytes=options['MAX_BYTES'],
+                   pool_connections=options['POOL_CONNECTIONS'],
+                   pool_maxsize=options['POOL_MAXSIZE'])
+
+    def download(self, url, etag='', last_modified=''):
+        """
+        Скачивает прайс-лист условным запросом.
+
+        Тело читается частями во временный файл, который держится в памяти до FEED_SPOOL_MAX_MEMORY байт
+        и затем переносится на диск. Одновременно считается хэш содержимого.
+
+        Args:
+            url (str): Ссылка на прайс-лист.
+            etag (str): ETag прошлого успешного импорта.
+            last_modified (str): Last-Modified прошлого успешного импорта.
+
+        Returns:
+            FeedDownload: Скачанный прайс-лист.
+
+        Raises:
+            ValueError: Прайс-лист больше FEED_FETCH['MAX_BYTES'].
+            requests.RequestException: Ошибка соединения или HTTP-статус ошибки.
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        started = time.perf_counter()
+        try:
+            download = self._download(url, headers, etag, last_modified)
+        except Exception:
+            self._record(failed=1, seconds=time.perf_counter() - started)
+            raise
+        download.seconds = time.perf_counter() - started
+        self._record(downloads=1, not_modified=int(download.not_modified), bytes=download.size,
+                     seconds=download.seconds)
+        return download
+
+    def get_metrics(self):
+        with self._lock:
+            return dict(self._metrics)
+
+    def _download(self, url, headers, etag, last_modified):
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 304:
+                return FeedDownload(etag=response.headers.get('ETag', etag),
+                                    last_modified=response.headers.get('Last-Modified', last_modified))
+            response.raise_for_status()
+            self._check_size(int(response.headers.get('Content-Length') or 0))
+
+            body = SpooledTemporaryFile(max_size=settings.FEED_SPOOL_MAX_MEMORY)
+            content_hash = hashlib.sha256()
+            size = 0
+            try:
+                for chunk in response.iter_content(chunk_size=settings.FEED_CHUNK_SIZE):
+                    size += len(chunk)
+                    self._check_size(size)
+                    content_hash.update(chunk)
+                    body.write(chunk)
+            except Exception:
+                body.close()
+                raise
+            body.seek(0)
+            return FeedDownload(body, content_hash.hexdigest(), response.headers.get('ETag', ''),
+                                response.headers.get('Last-Modified', ''), size)
+
+    def _check_size(self, size):
+        if self.max_bytes and size > self.max_bytes:
+            raise ValueError(f'Прайс-лист больше {self.max_bytes} байт')
+
+    def _record(self, **values):
+        with self._lock:
+            for name, value in values.items():
+                self._metrics[name] += value
+
+
+_feed_client = None
+
+
+def get_feed_client():
+    """
+    Возвращает общий для процесса FeedClient, создавая его при первом обращении
+    """
+    global _feed_client
+    if _feed_client is None:
+        _feed_client = FeedClient.from_settings()
+    return _feed_client
+
+
+def download_feed(url, etag='', last_modified=''):
+    return get_feed_client().download(url, etag, last_modified)
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 с числом итераций из settings.PASSWORD_HASH_ITERATIONS.
+
+    Алгоритм тот же, что у стандартного хэшера, поэтому существующие пароли проверяются как раньше,
+    а при расхождении числа итераций Django пересчитывает хэш при следующем успешном входе.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
@@ -0,0 +1,80 @@
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+
+from api.models import IdempotencyKey
+from api.renderers import JsonResponse
+
+
+def expired_before():
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def prune_idempotency_keys():
+    """
+    Удаляет ключи старше IDEMPOTENCY_KEY_TTL, вызывается командой prune_idempotency_keys
+
+    Returns:
+        int: Количество удаленных ключей.
+    """
+    return IdempotencyKey.objects.filter(created_at__lt=expired_before()).delete()[0]
+
+
+def idempotent(view_method):
+    """
+    Декоратор метода APIView, выполняющий запрос с заголовком Idempotency-Key не больше одного раза.
+
+    Ключ записывается в одной транзакции с изменениями представления, поэтому параллельный повтор
+    ждет завершения первого запроса на уникальном индексе, а затем получает сохраненный ответ.
+    Ответы 5xx не сохраняются, и такой запрос можно повторить с тем же ключом.
+    Ключ действует IDEMPOTENCY_KEY_TTL секунд, после этого тот же ключ выполняет запрос заново.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+
+        key = key[:255]
+        with transaction.atomic():
+            IdempotencyKey.objects.filter(user_id=request.user.id, key=key, created_at__lt=expired_before()).delete()
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(user_id=request.user.id, key=key,
+                                                           method=request.method, path=request.path)
+            except IntegrityError:
+                return replay(IdempotencyKey.objects.filter(user_id=request.user.id, key=key).first(), request)
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code >= 500:
+                record.delete()
+                return response
+
+            if hasattr(response, 'render'):
+                response.render()
+            record.status_code = response.status_code
+            record.content_type = response.get('Content-Type', '')
+            record.response_body = response.content
+            record.save(update_fields=['status_code', 'content_type', 'response_body'])
+        return response
+
+    return wrapper
+
+
+def replay(record, request):
+    """
+    Ответ на повтор ключа. Если первый запрос еще выполняется или только что завершился ошибкой,
+    сохраненного ответа нет, и клиент получает 409 с предложением повторить запрос позже
+    """
+    if record is None or record.status_code is None:
+        return JsonResponse({'Status': False, 'Error': 'Запрос с этим Idempotency-Key еще выполняется'}, status=409)
+    if record.method != request.method or record.path != request.path:
+        return JsonResponse({'Status': False, 'Error': 'Idempotency-Key уже использован для другого запроса'},
+                            status=422)
+    response = HttpResponse(bytes(record.response_body), status=record.status_code, content_type=record.content_type)
+    response['Idempotent-Replayed'] = 'true'
+    return response
@@ -0,0 +1,297 @@
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from api.models import Category, Product, ProductInfo, Parameter, ProductParameter, Shop
+from api.search import get_search_backend
+from api.utils import chunked
+
+REQUIRED_GOODS_FIELDS = {'category', 'name', 'price', 'quantity'}
+PRODUCT_INFO_FIELDS = ('product_id', 'model', 'name', 'price', 'price_rrc', 'quantity')
+MAX_IMPORT_ERRORS = 100
+
+
+class QueryCounter:
+    """
+    Обертка для connection.execute_wrapper, считающая выполненные SQL-запросы
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class CatalogImporter:
+    """
+    Пакетный импорт прайс-листа магазина.
+
+    Категории, продукты и параметры сопоставляются несколькими запросами на пакет товаров.
+    Товары сравниваются с уже загруженными по id из прайс-листа (или по model, если id нет):
+    новые создаются, измененные обновляются, пропавшие из прайс-листа удаляются.
+    Загруженный товар, строка которого в прайс-листе не прошла проверку, не меняется и не удаляется.
+    Все изменения выполняются через bulk_create/bulk_update в одной транзакции,
+    затронутые товары сразу обновляются в поисковом индексе.
+
+    Methods:
+        - run: Импортировать категории и товары, вернуть статистику импорта
+
+    Attributes:
+        - shop: Магазин, в который загружается прайс-лист
+        - batch_size: Количество товаров в одном пакете
+    """
+
+    def __init__(self, shop, batch_size=None, progress=None):
+        self.shop = shop
+        self.batch_size = batch_size or settings.CATALOG_IMPORT_BATCH_SIZE
+        self.progress = progress
+        self.search = get_search_backend()
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.deleted = 0
+        self.errors = []
+        self.keys = set()
+        self.missing_ids = set()
+        self.started = None
+        self.queries = QueryCounter()
+
+    def run(self, categories, goods):
+        """
+        Импортирует прайс-лист.
+
+        Args:
+            categories (list): Категории из прайс-листа.
+            goods (Iterable): Товары из прайс-листа.
+
+        Returns:
+            dict: Количество строк, строк в секунду, SQL-запросов и ошибки импорта.
+        """
+        self.started = time.perf_counter()
+        with connection.execute_wrapper(self.queries), transaction.atomic():
+            self.import_categories(categories)
+            self.missing_ids = set(ProductInfo.objects.filter(shop_id=self.shop.id).values_list('id', flat=True))
+            for batch in chunked(goods, self.batch_size):
+                self.import_goods(batch)
+                if self.progress:
+                    self.progress(self.stats())
+            self.delete_missing()
+            Shop.objects.filter(id=self.shop.id).update(catalog_version=F('catalog_version') + 1)
+        return self.stats()
+
+    def stats(self):
+        seconds = time.perf_counter() - self.started
+        return {
+            'rows': self.rows,
+            'seconds': round(seconds, 3),
+            'rows_per_sec': round(self.rows / seconds, 1) if seconds else 0,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'deleted': self.deleted,
+            'queries': self.queries.count,
+            'errors': self.errors,
+        }
+
+    def import_categories(self, categories):
+        names = {category['id']: category['name'] for category in categories}
+        existing = Category.objects.in_bulk(names)
+
+        created = [Category(id=category_id, name=name) for category_id, name in names.items()
+                   if category_id not in existing]
+        changed = []
+        for category_id, category in existing.items():
+            if category.name != names[category_id]:
+                category.name = names[category_id]
+                changed.append(category)
+
+        Category.objects.bulk_create(created, batch_size=self.batch_size)
+        Category.objects.bulk_update(changed, ['name'], batch_size=self.batch_size)
+        if changed:
+            self.search.index(ProductInfo.objects.filter(
+                product__category__in=changed).values_list('id', flat=True).iterator())
+            # Категории общие для магазинов: переименование меняет и каталоги других магазинов
+            Shop.objects.filter(id__in=ProductInfo.objects.filter(product__category__in=changed).values(
+                'shop_id')).exclude(id=self.shop.id).update(catalog_version=F('catalog_version') + 1)
+
+        shop_category = Category.shops.through
+        shop_category.objects.bulk_create(
+            [shop_category(category_id=category_id, shop_id=self.shop.id) for category_id in names],
+            batch_size=self.batch_size, ignore_conflicts=True)
+
+    def import_goods(self, goods):
+        valid, rejected = [], []
+        for item in goods:
+            (valid if self._validate(item) else rejected).append(item)
+        goods = valid
+        # Товар с ошибкой в строке прайс-листа остается в магазине без изменений, а не удаляется как пропавший
+        rejected = [item for item in rejected if item.get('id') is not None or item.get('model')]
+        products = self._resolve_products(goods)
+        parameters = self._resolve_parameters(goods)
+        existing = self._existing_product_infos(goods + rejected)
+        for item in rejected:
+            product_info = existing.get(self._key(item))
+            if product_info is not None:
+                self.missing_ids.discard(product_info.id)
+
+        created, changed, unchanged = [], [], []
+        for item in goods:
+            fields = {
+                'product_id': products[(item['category'], item['name'])],
+                'model': item.get('model', ''),
+                'name': item['name'],
+                'price': item['price'],
+                'price_rrc': item.get('price_rrc'),
+                'quantity': item['quantity'],
+            }
+            product_info = existing.get(self._key(item))
+            if product_info is None:
+                created.append((ProductInfo(shop_id=self.shop.id, external_id=item.get('id'), **fields), item))
+                continue
+
+            self.missing_ids.discard(product_info.id)
+            if all(getattr(product_info, field) == value for field, value in fields.items()):
+                unchanged.append((product_info, item))
+            else:
+                for field, value in fields.items():
+                    setattr(product_info, field, value)
+                changed.append((product_info, item))
+
+        ProductInfo.objects.bulk_create([product_info for product_info, _ in created], batch_size=self.batch_size)
+        ProductInfo.objects.bulk_update([product_info for product_info, _ in changed], PRODUCT_INFO_FIELDS,
+                                        batch_size=self.batch_size)
+        changed_parameters = self._sync_parameters(created, changed + unchanged, parameters)
+        updated_ids = {product_info.id for product_info, _ in changed} | changed_parameters
+        self.search.index([product_info.id for product_info, _ in created] + list(updated_ids))
+
+        self.rows += len(goods)
+        self.inserted += len(created)
+        self.updated += len(updated_ids)
+
+    def delete_missing(self):
+        """
+        Удаляет товары магазина, которых не оказалось в прайс-листе
+        """
+        for batch in chunked(self.missing_ids, self.batch_size):
+            ProductInfo.objects.filter(id__in=batch).delete()
+            self.search.remove(batch)
+            self.deleted += len(batch)
+        self.missing_ids = set()
+
+    def _key(self, item):
+        if item.get('id') is not None:
+            return 'id', item['id']
+        return 'model', item.get('model', '')
+
+    def _existing_product_infos(self, goods):
+        """
+        Возвращает словарь {ключ товара: ProductInfo} для уже загруженных товаров пакета
+        """
+        external_ids = [item['id'] for item in goods if item.get('id') is not None]
+        feed_models = [item.get('model', '') for item in goods if item.get('id') is None]
+        queryset = ProductInfo.objects.filter(shop_id=self.shop.id).filter(
+            Q(external_id__in=external_ids) | Q(external_id__isnull=True, model__in=feed_models))
+
+        existing = {}
+        for product_info in queryset:
+            if product_info.external_id is not None:
+                existing.setdefault(('id', product_info.external_id), product_info)
+            else:
+                existing.setdefault(('model', product_info.model), product_info)
+        return existing
+
+    def _sync_parameters(self, created, existing, parameters):
+        """
+        Создает параметры новых товаров и применяет к загруженным товарам только изменившиеся значения.
+
+        Returns:
+            set: id загруженных товаров, у которых изменились параметры.
+        """
+        new_parameters = [
+            ProductParameter(product_info_id=product_info.id, parameter_id=parameters[name], value=str(value))
+            for product_info, item in created
+            for name, value in item.get('parameters', {}).items()
+        ]
+
+        current = {}
+        for product_parameter in ProductParameter.objects.filter(
+                product_info_id__in=[product_info.id for product_info, _ in existing]):
+            current.setdefault(product_parameter.product_info_id, {})[product_parameter.parameter_id] = \
+                product_parameter
+
+        changed_ids = set()
+        updated, deleted_ids = [], []
+        for product_info, item in existing:
+            values = {parameters[name]: str(value) for name, value in item.get('parameters', {}).items()}
+            stored = current.get(product_info.id, {})
+            for parameter_id, value in values.items():
+                product_parameter = stored.get(parameter_id)
+                if product_parameter is None:
+                    new_parameters.append(ProductParameter(
+                        product_info_id=product_info.id, parameter_id=parameter_id, value=value))
+                elif product_parameter.value != value:
+                    product_parameter.value = value
+                    updated.append(product_parameter)
+                else:
+                    continue
+                changed_ids.add(product_info.id)
+            for parameter_id, product_parameter in stored.items():
+                if parameter_id not in values:
+                    deleted_ids.append(product_parameter.id)
+                    changed_ids.add(product_info.id)
+
+        ProductParameter.objects.bulk_create(new_parameters, batch_size=self.batch_size)
+        ProductParameter.objects.bulk_update(updated, ['value'], batch_size=self.batch_size)
+        for batch in chunked(deleted_ids, self.batch_size):
+            ProductParameter.objects.filter(id__in=batch).delete()
+        return changed_ids
+
+    def _validate(self, item):
+        missing = REQUIRED_GOODS_FIELDS.difference(item)
+        if missing:
+            self._error(f'Товар {item.get("id", item.get("name"))}: нет полей {", ".join(sorted(missing))}')
+            return False
+        key = self._key(item)
+        if key in self.keys:
+            self._error(f'Товар {key[1]}: повторяется в прайс-листе')
+            return False
+        self.keys.add(key)
+        return True
+
+    def _error(self, message):
+        if len(self.errors) < MAX_IMPORT_ERRORS:
+            self.errors.append(message)
+
+    def _resolve_products(self, goods):
+        """
+        Возвращает словарь {(id категории, название): id продукта}, создавая недостающие продукты
+        """
+        keys = {(item['category'], item['name']) for item in goods}
+        products = {}
+        for category_id, name, product_id in Product.objects.filter(
+                category_id__in={category_id for category_id, _ in keys},
+                name__in={name for _, name in keys}).values_list('category_id', 'name', 'id'):
+            products.setdefault((category_id, name), product_id)
+
+        created = [Product(category_id=category_id, name=name) for category_id, name in keys
+                   if (category_id, name) not in products]
+        Product.objects.bulk_create(created, batch_size=self.batch_size)
+        products.update({(product.category_id, product.name): product.id for product in created})
+        return products
+
+    def _resolve_parameters(self, goods):
+        """
+        Возвращает словарь {название параметра: id}, создавая недостающие параметры
+        """
+        names = {name for item in goods for name in item.get('parameters', {})}
+        parameters = {}
+        for name, parameter_id in Parameter.objects.filter(name__in=names).values_list('name', 'id'):
+            parameters.setdefault(name, parameter_id)
+
+        created = [Parameter(name=name) for name in names if name not in parameters]
+        Parameter.objects.bulk_create(created, batch_size=self.batch_size)
+        parameters.update({parameter.name: parameter.id for parameter in created})
+        return parameters
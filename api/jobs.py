@@ -0,0 +1,139 @@
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from api.feeds import download_feed, parse_feed
+from api.imports import CatalogImporter
+from api.models import FeedCache, ImportJob, Shop
+
+
+def import_shop_feed(user_id, url, progress=None):
+    """
+    Скачивает прайс-лист по ссылке и импортирует его в магазин пользователя.
+
+    Если сервер ответил 304 или содержимое совпадает с прошлым успешным импортом,
+    разбор и запись в базу пропускаются.
+
+    Args:
+        user_id (int): Пользователь-магазин.
+        url (str): Ссылка на прайс-лист.
+        progress (callable): Вызывается со статистикой импорта после каждого пакета товаров.
+
+    Returns:
+        dict: Статистика импорта CatalogImporter или причина пропуска в ключе skipped.
+    """
+    feed_cache = FeedCache.objects.filter(user_id=user_id, url=url).first()
+    if feed_cache:
+        download = download_feed(url, feed_cache.etag, feed_cache.last_modified)
+    else:
+        download = download_feed(url)
+
+    if download.not_modified:
+        return skipped_import('not_modified', download)
+    with download.body:
+        if feed_cache and feed_cache.content_hash == download.content_hash:
+            FeedCache.objects.filter(id=feed_cache.id).update(etag=download.etag,
+                                                              last_modified=download.last_modified)
+            return skipped_import('unchanged', download)
+
+        feed, goods = parse_feed(download.body)
+        shop, _ = Shop.objects.get_or_create(name=feed['name'], user_id=user_id)
+        result = CatalogImporter(shop, progress=progress).run(feed['categories'], goods)
+    result.update(fetch_seconds=round(download.seconds, 3), fetch_bytes=download.size)
+
+    FeedCache.objects.update_or_create(user_id=user_id, defaults={
+        'url': url,
+        'etag': download.etag,
+        'last_modified': download.last_modified,
+        'content_hash': download.content_hash,
+    })
+    return result
+
+
+def skipped_import(reason, download):
+    return {'rows': 0, 'rows_per_sec': 0, 'errors': [], 'skipped': reason,
+            'fetch_seconds': round(download.seconds, 3), 'fetch_bytes': download.size}
+
+
+def default_worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def progress_key(job_id):
+    return f'import_job:{job_id}'
+
+
+def get_job_progress(job_id):
+    """
+    Возвращает промежуточный прогресс выполняющейся задачи.
+
+    Импорт идет в одной транзакции, поэтому прогресс пишется не в таблицу задач,
+    а в общий кэш IMPORT_PROGRESS_CACHE, видимый из других процессов.
+    """
+    return caches[settings.IMPORT_PROGRESS_CACHE].get(progress_key(job_id), {})
+
+
+def claim_import_job(worker):
+    """
+    Забирает из очереди самую старую задачу магазина, у которого сейчас нет выполняющегося импорта.
+
+    Args:
+        worker (str): Имя обработчика, которое сохраняется в задаче.
+
+    Returns:
+        ImportJob | None: Захваченная задача или None, если очередь пуста.
+    """
+    ImportJob.objects.filter(
+        status='running',
+        started_at__lt=timezone.now() - timedelta(seconds=settings.IMPORT_JOB_TIMEOUT)).update(
+        status='failed', errors=['Превышено время выполнения'], finished_at=timezone.now())
+
+    # Проверка выполняющейся задачи магазина входит в тот же условный UPDATE, что и захват,
+    # поэтому два обработчика не возьмут задачи одного магазина и в SQLite, где select_for_update не блокирует
+    running = ImportJob.objects.filter(user_id=OuterRef('user_id'), status='running')
+    candidates = ImportJob.objects.filter(status='queued').values_list('id', flat=True)
+    for job_id in candidates[:settings.IMPORT_JOB_CLAIM_CANDIDATES]:
+        if ImportJob.objects.filter(~Exists(running), id=job_id, status='queued').update(
+                status='running', worker=worker, started_at=timezone.now()):
+            return ImportJob.objects.get(id=job_id)
+    return None
+
+
+def run_import_job(job):
+    """
+    Выполняет захваченную задачу и сохраняет ее итоговую статистику.
+
+    Итог записывается условным UPDATE только пока задача выполняется этим обработчиком: задачу,
+    снятую по IMPORT_JOB_TIMEOUT, мог уже сменить другой обработчик, и ее статус failed сохраняется.
+    """
+    progress_cache = caches[settings.IMPORT_PROGRESS_CACHE]
+
+    def progress(stats):
+        progress_cache.set(progress_key(job.id), {
+            'rows_processed': stats['rows'],
+            'rows_per_sec': stats['rows_per_sec'],
+            'errors': stats['errors'],
+        }, settings.IMPORT_JOB_TIMEOUT)
+
+    try:
+        result = import_shop_feed(job.user_id, job.url, progress=progress)
+    except Exception as error:
+        job.status = 'failed'
+        job.errors = [str(error)]
+    else:
+        job.status = 'skipped' if result.get('skipped') else 'done'
+        job.rows_processed = result['rows']
+        job.rows_per_sec = result['rows_per_sec']
+        job.errors = result['errors']
+    job.finished_at = timezone.now()
+    fields = ('status', 'rows_processed', 'rows_per_sec', 'errors', 'finished_at')
+    if not ImportJob.objects.filter(id=job.id, status='running', worker=job.worker).update(
+            **{field: getattr(job, field) for field in fields}):
+        job.refresh_from_db()
+    progress_cache.delete(progress_key(job.id))
+    return job
@@ -0,0 +1,241 @@
+import threading
+import time
+import uuid
+
+from django import http
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.authentication import CachedTokenAuthentication, get_local_cache
+from api.fast_serializers import order_data, product_info_data
+from api.imports import QueryCounter
+from api.models import Category, Order, OrderItem, Parameter, Product, ProductInfo, ProductParameter, Shop, User
+from api.renderers import JSON_BACKEND, JSON_BACKENDS, JsonResponse, available_json_backends
+from api.serializers import OrderSerializer, ProductInfoSerializer
+from api.views import BasketView, OrderView
+
+
+def product_payload(count):
+    """
+    Список товаров в том виде, в каком его отдает ProductInfoSerializer
+    """
+    return [{
+        'name': f'Смартфон Apple iPhone XS Max 512GB ({index})',
+        'product': {'name': f'Смартфон Apple iPhone XS Max 512GB ({index})', 'category': 'Смартфоны'},
+        'product_parameters': [
+            {'parameter': 'Диагональ (дюйм)', 'value': '6.5'},
+            {'parameter': 'Разрешение (пикс)', 'value': '2688x1242'},
+            {'parameter': 'Встроенная память (Гб)', 'value': '512'},
+            {'parameter': 'Цвет', 'value': 'золотистый'},
+        ],
+        'quantity': index % 50,
+        'price': 110000 + index,
+    } for index in range(count)]
+
+
+def product_info_rows(count):
+    """
+    Товары в виде моделей с загруженными параметрами для ProductInfoSerializer
+    и строк values() с параметрами для product_info_data
+    """
+    category = Category(id=1, name='Смартфоны')
+    parameters = [Parameter(id=index, name=name) for index, name in enumerate(
+        ('Диагональ (дюйм)', 'Разрешение (пикс)', 'Встроенная память (Гб)', 'Цвет'))]
+    values = ('6.5', '2688x1242', '512', 'золотистый')
+
+    instances, rows, product_parameters = [], [], {}
+    for index in range(count):
+        name = f'Смартфон Apple iPhone XS Max 512GB ({index})'
+        product = Product(id=index, name=name, category=category)
+        instance = ProductInfo(id=index, name=name, product=product, quantity=index % 50, price=110000 + index)
+        instance._prefetched_objects_cache = {'product_details': [
+            ProductParameter(parameter=parameter, value=value) for parameter, value in zip(parameters, values)]}
+        instances.append(instance)
+        rows.append({'id': index, 'name': name, 'product__name': name, 'product__category__name': category.name,
+                     'quantity': index % 50, 'price': 110000 + index})
+        product_parameters[index] = [{'parameter': parameter.name, 'value': value}
+                                     for parameter, value in zip(parameters, values)]
+    return instances, rows, product_parameters
+
+
+def order_rows(count):
+    """
+    Заказы в виде моделей для OrderSerializer и строк values() для order_data
+    """
+    now = timezone.now()
+    instances, rows = [], []
+    for index in range(count):
+        values = {'id': index, 'dt': now, 'updated_at': now, 'status': 'new', 'total_sum': 1000 + index,
+                  'user_id': index % 100, 'contact_id': None}
+        instances.append(Order(**values))
+        rows.append(values)
+    return instances, rows
+
+
+def measure(func, repeat):
+    """
+    Возвращает лучшее время одного вызова func из repeat попыток в миллисекундах
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+class Command(BaseCommand):
+    help = 'Замеряет скорость горячих участков API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('benchmark', choices=('json', 'serializers', 'auth', 'db'), help='Что замерять')
+        parser.add_argument('--items', type=int, default=1000, help='Количество товаров или заказов')
+        parser.add_argument('--repeat', type=int, default=20, help='Количество повторов, берется лучший результат')
+        parser.add_argument('--workers', type=int, default=8, help='Количество параллельных потоков для db')
+
+    def handle(self, *args, **options):
+        if options['benchmark'] == 'db':
+            return self.benchmark_db(options['items'], options['workers'])
+        getattr(self, f'benchmark_{options["benchmark"]}')(options['items'], options['repeat'])
+
+    def report(self, name, milliseconds, baseline=None):
+        line = f'{name:<40}{milliseconds:>10.2f} мс'
+        if baseline:
+            line += f'{baseline / milliseconds:>8.1f}x'
+        self.stdout.write(line)
+
+    def benchmark_json(self, items, repeat):
+        """
+        Кодирование и разбор списка товаров каждой установленной библиотекой JSON
+        """
+        payload = product_payload(items)
+        self.stdout.write(f'JSON: {items} товаров, лучший из {repeat} повторов')
+        baseline = None
+        for name in reversed(available_json_backends()):
+            dumps, loads = JSON_BACKENDS[name]
+            body = dumps(payload)
+            encode = measure(lambda: dumps(payload), repeat)
+            decode = measure(lambda: loads(body), repeat)
+            baseline = baseline or (encode, decode)
+            self.report(f'{name}.dumps', encode, baseline[0])
+            self.report(f'{name}.loads', decode, baseline[1])
+
+        django_response = measure(lambda: http.JsonResponse(payload, safe=False), repeat)
+        self.report('django JsonResponse', django_response)
+        self.report(f'api JsonResponse ({JSON_BACKEND})',
+                    measure(lambda: JsonResponse(payload, safe=False), repeat), django_response)
+
+    def benchmark_serializers(self, items, repeat):
+        """
+        DRF-сериализаторы против сборки словарей из строк values(), с проверкой совпадения JSON
+        """
+        self.stdout.write(f'Сериализация: {items} строк, лучший из {repeat} повторов')
+        product_infos, product_info_values, product_parameters = product_info_rows(items)
+        orders, order_values = order_rows(items)
+        cases = (
+            ('ProductInfo', product_infos, ProductInfoSerializer,
+             lambda: product_info_data(product_info_values, product_parameters)),
+            ('Order', orders, OrderSerializer, lambda: order_data(order_values)),
+        )
+        for name, instances, serializer_class, fast_data in cases:
+            same = JsonResponse(serializer_class(instances, many=True).data, safe=False).content == \
+                JsonResponse(fast_data(), safe=False).content
+            drf = measure(lambda: serializer_class(instances, many=True).data, repeat)
+            self.report(f'{name} DRF', drf)
+            self.report(f'{name} values()', measure(fast_data, repeat), drf)
+            self.stdout.write(f'{name}: JSON совпадает' if same else self.style.ERROR(f'{name}: JSON отличается'))
+
+    def benchmark_auth(self, items, repeat):
+        """
+        Запросы и время GET корзины и заказов с TokenAuthentication и CachedTokenAuthentication.
+        Тестовый пользователь создается в транзакции, которая откатывается после замера.
+        """
+        self.stdout.write(f'Аутентификация: {items} запросов, лучший из {repeat} повторов')
+        with transaction.atomic():
+            user = User.objects.create_user('benchmark@example.com', 'benchmark', is_active=True)
+            token = Token.objects.create(user=user)
+            factory = RequestFactory()
+            get_local_cache().clear()
+            for name, view_class in (('basket', BasketView), ('orders', OrderView)):
+                baseline = None
+                for authentication in (TokenAuthentication, CachedTokenAuthentication):
+                    view = view_class.as_view(authentication_classes=[authentication])
+                    request = factory.get(f'/{name}/', HTTP_AUTHORIZATION=f'Token {token.key}')
+
+                    def run():
+                        for _ in range(items):
+                            view(request)
+
+                    run()
+                    queries = QueryCounter()
+                    with connection.execute_wrapper(queries):
+                        view(request)
+                    milliseconds = measure(run, repeat) / items
+                    baseline = baseline or milliseconds
+                    self.report(f'{name} {authentication.__name__}', milliseconds, baseline)
+                    self.stdout.write(f'{"":<40}{queries.count:>10} запросов')
+            transaction.set_rollback(True)
+
+    def benchmark_db(self, items, workers):
+        """
+        Пропускная способность записи: workers потоков добавляют по items позиций в свои корзины,
+        каждая позиция в отдельной транзакции, как в BasketView. Для SQLite замер повторяется
+        без настроек SQLITE_PRAGMAS. Созданные данные удаляются после замера.
+        """
+        vendor = connection.vendor
+        self.stdout.write(f'Запись в корзины ({vendor}): {workers} потоков по {items} позиций')
+        suffix = uuid.uuid4().hex[:8]
+        owner = User.objects.create_user(f'benchmark-shop-{suffix}@example.com', 'benchmark', type='shop',
+                                         is_active=True)
+        shop = Shop.objects.create(name=f'benchmark-{suffix}', user=owner)
+        category = Category.objects.create(name=f'benchmark-{suffix}')
+        product = Product.objects.create(name=f'benchmark-{suffix}', category=category)
+        buyers = [User.objects.create_user(f'benchmark-{suffix}-{index}@example.com', 'benchmark',
+                                           is_active=True) for index in range(workers)]
+        try:
+            profiles = [('', settings.SQLITE_PRAGMAS)]
+            if vendor == 'sqlite':
+                profiles.insert(0, (' journal_mode=DELETE, synchronous=FULL',
+                                    {'journal_mode': 'DELETE', 'synchronous': 'FULL'}))
+            for label, pragmas in profiles:
+                with override_settings(SQLITE_PRAGMAS=pragmas):
+                    connection.close()
+                    seconds, errors = self.run_writers(buyers, shop.id, product.id, items)
+                self.stdout.write(f'{vendor}{label}: {workers * items / seconds:.0f} записей/с, '
+                                  f'{seconds:.2f} с, ошибок: {errors}')
+        finally:
+            connection.close()
+            User.objects.filter(id__in=[owner.id] + [buyer.id for buyer in buyers]).delete()
+            category.delete()
+
+    def run_writers(self, buyers, shop_id, product_id, items):
+        errors = []
+
+        def write(buyer):
+            try:
+                basket = Order.objects.create(user=buyer, status='basket')
+                for _ in range(items):
+                    try:
+                        with transaction.atomic():
+                            OrderItem.objects.create(order=basket, product_id=product_id, shop_id=shop_id,
+                                                     quantity=1, price=100)
+                            Order.objects.filter(id=basket.id).update(total_sum=F('total_sum') + 100)
+                    except OperationalError:
+                        errors.append(1)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=write, args=(buyer,)) for buyer in buyers]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started, len(errors)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import EXPORT_FORMATS, export_catalog
+
+
+class Command(BaseCommand):
+    help = 'Выгружает каталог магазина или весь каталог в NDJSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='export_format', choices=EXPORT_FORMATS, default='ndjson',
+                            help='Формат выгрузки')
+        parser.add_argument('--shop', type=int, help='id магазина, по умолчанию весь каталог')
+        parser.add_argument('--output', help='Файл выгрузки, по умолчанию stdout')
+        parser.add_argument('--chunk-size', type=int, help='Количество товаров, читаемых за один раз')
+
+    def handle(self, *args, **options):
+        blocks = export_catalog(options['export_format'], options['shop'], options['chunk_size'])
+        if not options['output']:
+            for block in blocks:
+                self.stdout.write(block, ending='')
+            return
+
+        try:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(blocks)
+        except OSError as error:
+            raise CommandError(error)
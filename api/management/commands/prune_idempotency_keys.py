@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from api.idempotency import prune_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = 'Удаляет ключи Idempotency-Key старше IDEMPOTENCY_KEY_TTL'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Удалено ключей: {prune_idempotency_keys()}')
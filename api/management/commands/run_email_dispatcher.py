@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+
+from api.outbox import OutboxDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди EmailOutbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Количество писем в одном пакете')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Пауза в секундах между опросами пустой очереди')
+        parser.add_argument('--once', action='store_true', help='Отправить накопившиеся письма и завершиться')
+
+    def handle(self, *args, **options):
+        dispatcher = OutboxDispatcher(batch_size=options['batch_size'])
+        try:
+            while True:
+                try:
+                    sent = dispatcher.dispatch()
+                except DatabaseError as error:
+                    self.stderr.write(f'Ошибка базы данных: {error}')
+                    time.sleep(options['poll_interval'])
+                    continue
+                if sent:
+                    self.stdout.write(f'Отправлено писем: {sent}')
+                    continue
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+        finally:
+            dispatcher.close()
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError
+
+from api.feeds import get_feed_client
+from api.jobs import claim_import_job, default_worker_name, run_import_job
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает очередь задач импорта прайс-листов магазинов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--worker', default=default_worker_name(), help='Имя обработчика')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Пауза в секундах между опросами пустой очереди')
+        parser.add_argument('--once', action='store_true', help='Обработать очередь и завершиться')
+
+    def handle(self, *args, **options):
+        worker = options['worker']
+        while True:
+            try:
+                job = claim_import_job(worker)
+            except OperationalError as error:
+                self.stderr.write(f'{worker}: ошибка базы данных: {error}')
+                time.sleep(options['poll_interval'])
+                continue
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+
+            self.stdout.write(f'{worker}: задача {job.id} {job.url}')
+            try:
+                job = run_import_job(job)
+            except OperationalError as error:
+                # Задача останется выполняющейся и будет снята по IMPORT_JOB_TIMEOUT
+                self.stderr.write(f'{worker}: задача {job.id}, ошибка базы данных: {error}')
+                time.sleep(options['poll_interval'])
+                continue
+            self.stdout.write(f'{worker}: задача {job.id} {job.status}, строк {job.rows_processed}, '
+                              f'{job.rows_per_sec} строк/сек')
+            self.stdout.write(f'{worker}: скачивания {get_feed_client().get_metrics()}')
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+CREATE_SQL = ("CREATE VIRTUAL TABLE IF NOT EXISTS api_productinfo_search USING fts5("
+              "product, name, model, category, parameters, "
+              "tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+DROP_SQL = 'DROP TABLE IF EXISTS api_productinfo_search'
+
+
+def create_search_table(apps, schema_editor):
+    """
+    Таблица FTS5 для api.search.SQLiteFTSBackend, только в SQLite
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE_SQL)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
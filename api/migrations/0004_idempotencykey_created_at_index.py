@@ -0,0 +1,17 @@
+# Generated by Django 5.0.3 on 2026-10-17 04:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_order_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='idempotencykey',
+            index=models.Index(fields=['created_at'], name='api_idempot_created_91e60b_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+CREATE_SQL = [
+    'CREATE TABLE IF NOT EXISTS api_productinfo_search '
+    '(product_info_id bigint PRIMARY KEY, document tsvector NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS api_productinfo_search_document ON api_productinfo_search USING GIN (document)',
+]
+DROP_SQL = 'DROP TABLE IF EXISTS api_productinfo_search'
+
+
+def create_search_table(apps, schema_editor):
+    """
+    Таблица tsvector для api.search.PostgreSQLSearchBackend, только в PostgreSQL.
+    Внешнего ключа на api_productinfo нет, чтобы не мешать TRUNCATE этой таблицы:
+    строки удаленных товаров отбрасываются при поиске соединением с api_productinfo.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in CREATE_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_idempotencykey_created_at_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
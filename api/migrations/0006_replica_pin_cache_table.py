@@ -0,0 +1,21 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_tables(apps, schema_editor):
+    """
+    Таблицы кэшей DatabaseCache из CACHES, в первую очередь REPLICA_PIN_CACHE (api.db.ReplicaPinningMiddleware).
+    Уже существующие таблицы пропускаются
+    """
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_productinfo_search_postgresql'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_tables, migrations.RunPython.noop),
+    ]
@@ -2,8 +2,11 @@ from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser, Permission, Group
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.db import models
+from django.utils import timezone
 from django_rest_passwordreset.tokens import get_token_generator
 
+from api.tokens import access_token
+
 
 TYPE_CHOICES = (
         ('phone', 'Телефон'),
@@ -16,6 +19,18 @@ USER_TYPE_CHOICES = (
     ('shop', 'Магазин'),
     ('buyer', 'Покупатель')
 )
+IMPORT_JOB_STATUS_CHOICES = (
+    ('queued', 'В очереди'),
+    ('running', 'Выполняется'),
+    ('done', 'Завершен'),
+    ('skipped', 'Без изменений'),
+    ('failed', 'Ошибка'),
+)
+OUTBOX_STATUS_CHOICES = (
+    ('pending', 'Ожидает отправки'),
+    ('sent', 'Отправлено'),
+    ('failed', 'Ошибка'),
+)
 
 
 class UserManager(BaseUserManager):
@@ -95,6 +110,12 @@ class User(AbstractUser):
         """
         return self._generate_jwt_token()
 
+    def _generate_jwt_token(self):
+        """
+        Подписанный токен доступа с коротким сроком действия (api.tokens.access_token)
+        """
+        return access_token(self)
+
     def __str__(self):
         return f'{self.first_name} {self.last_name}'
 
@@ -152,6 +173,7 @@ class Shop(models.Model):
                                 blank=True, null=True,
                                 on_delete=models.CASCADE)
     status = models.BooleanField(verbose_name='Статус магазина', default=True)
+    catalog_version = models.PositiveIntegerField(verbose_name='Версия каталога', default=0)
 
     def __str__(self):
         return self.name
@@ -191,6 +213,7 @@ class Product(models.Model):
 class ProductInfo(models.Model):
     product = models.ForeignKey(Product, related_name='products_info', on_delete=models.CASCADE)
     shop = models.ForeignKey(Shop, related_name='shops_info', on_delete=models.CASCADE)
+    external_id = models.PositiveIntegerField(verbose_name='Идентификатор в прайс-листе', blank=True, null=True)
     name = models.CharField(max_length=100, verbose_name='Название', blank=True)
     model = models.CharField(max_length=100, verbose_name='Название', blank=True)
     quantity = models.PositiveIntegerField(verbose_name='Количество', blank=True)
@@ -202,6 +225,13 @@ class ProductInfo(models.Model):
 
     class Meta:
         verbose_name = 'Информация о продукте'
+        constraints = [
+            models.UniqueConstraint(fields=('shop', 'external_id'), name='unique_shop_external_id'),
+        ]
+        indexes = [
+            models.Index(fields=('shop', 'product')),
+            models.Index(fields=('price',)),
+        ]
 
 
 class Parameter(models.Model):
@@ -218,10 +248,13 @@ class Parameter(models.Model):
 class ProductParameter(models.Model):
     product_info = models.ForeignKey(ProductInfo, related_name='product_details', on_delete=models.CASCADE)
     parameter = models.ForeignKey(Parameter, related_name='parameter_details', on_delete=models.CASCADE)
-    value = models.PositiveIntegerField()
+    value = models.CharField(max_length=100, verbose_name='Значение')
 
     class Meta:
         verbose_name = 'Параметры продукта'
+        indexes = [
+            models.Index(fields=('parameter', 'value')),
+        ]
 
     def __str__(self):
         return f'{self.product_info} {self.parameter}'
@@ -249,7 +282,9 @@ class Contact(models.Model):
 class Order(models.Model):
     user = models.ForeignKey(User, related_name='orders', on_delete=models.CASCADE)
     dt = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     status = models.CharField(verbose_name="Статус", max_length=50, blank=True)
+    total_sum = models.PositiveIntegerField(verbose_name='Сумма заказа', default=0)
     contact = models.ForeignKey(Contact, verbose_name='Контакт', blank=True, null=True, on_delete=models.CASCADE)
 
     def __str__(self):
@@ -258,6 +293,10 @@ class Order(models.Model):
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = "Список заказов"
+        indexes = [
+            models.Index(fields=('status', 'dt')),
+            models.Index(fields=('updated_at', 'id')),
+        ]
 
 
 class OrderItem(models.Model):
@@ -265,9 +304,111 @@ class OrderItem(models.Model):
     product = models.ForeignKey(Product, related_name='orderitem_product', on_delete=models.CASCADE)
     shop = models.ForeignKey(Shop, related_name='orderitem_shop', on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
+    price = models.PositiveIntegerField(verbose_name='Цена на момент добавления', default=0)
 
     def __str__(self):
         return f'{self.product}'
 
     class Meta:
-        verbose_name = 'Информация о заказе'
\ No newline at end of file
+        verbose_name = 'Информация о заказе'
+        indexes = [
+            models.Index(fields=('shop', 'order')),
+        ]
+
+
+class ImportJob(models.Model):
+    """
+    Задача на импорт прайс-листа магазина, выполняемая командой run_import_worker
+    """
+    user = models.ForeignKey(User, related_name='import_jobs', on_delete=models.CASCADE)
+    url = models.URLField(verbose_name='Ссылка')
+    status = models.CharField(verbose_name='Статус', choices=IMPORT_JOB_STATUS_CHOICES, max_length=10,
+                              default='queued', db_index=True)
+    worker = models.CharField(verbose_name='Обработчик', max_length=100, blank=True)
+    rows_processed = models.PositiveIntegerField(verbose_name='Обработано строк', default=0)
+    rows_per_sec = models.FloatField(verbose_name='Строк в секунду', default=0)
+    errors = models.JSONField(verbose_name='Ошибки', default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f'{self.url} {self.status}'
+
+    class Meta:
+        verbose_name = 'Задача импорта'
+        verbose_name_plural = "Список задач импорта"
+        ordering = ('id',)
+
+
+class FeedCache(models.Model):
+    """
+    Заголовки и хэш прайс-листа последнего успешного импорта магазина
+    """
+    user = models.OneToOneField(User, related_name='feed_cache', on_delete=models.CASCADE)
+    url = models.URLField(verbose_name='Ссылка')
+    etag = models.CharField(verbose_name='ETag', max_length=255, blank=True)
+    last_modified = models.CharField(verbose_name='Last-Modified', max_length=64, blank=True)
+    content_hash = models.CharField(verbose_name='Хэш содержимого', max_length=64, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.url
+
+    class Meta:
+        verbose_name = 'Кэш прайс-листа'
+        verbose_name_plural = "Кэш прайс-листов"
+
+
+class EmailOutbox(models.Model):
+    """
+    Исходящее письмо, записанное в одной транзакции с изменением, о котором оно сообщает.
+    Отправляется командой run_email_dispatcher.
+    """
+    subject = models.CharField(verbose_name='Тема', max_length=255)
+    body = models.TextField(verbose_name='Текст')
+    from_email = models.CharField(verbose_name='Отправитель', max_length=254, blank=True)
+    to = models.JSONField(verbose_name='Получатели', default=list)
+    status = models.CharField(verbose_name='Статус', choices=OUTBOX_STATUS_CHOICES, max_length=10, default='pending')
+    attempts = models.PositiveSmallIntegerField(verbose_name='Попытки', default=0)
+    next_attempt_at = models.DateTimeField(verbose_name='Следующая попытка', default=timezone.now)
+    last_error = models.TextField(verbose_name='Последняя ошибка', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return self.subject
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = "Очередь писем"
+        indexes = [
+            models.Index(fields=('status', 'next_attempt_at')),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """
+    Сохраненный ответ на запрос с заголовком Idempotency-Key
+    """
+    user = models.ForeignKey(User, related_name='idempotency_keys', on_delete=models.CASCADE)
+    key = models.CharField(verbose_name='Ключ', max_length=255)
+    method = models.CharField(verbose_name='Метод', max_length=10)
+    path = models.CharField(verbose_name='Путь', max_length=255)
+    status_code = models.PositiveSmallIntegerField(verbose_name='Код ответа', blank=True, null=True)
+    content_type = models.CharField(verbose_name='Тип ответа', max_length=100, blank=True)
+    response_body = models.BinaryField(verbose_name='Тело ответа', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.key
+
+    class Meta:
+        verbose_name = 'Ключ идемпотентности'
+        verbose_name_plural = "Ключи идемпотентности"
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'key'), name='unique_user_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=('created_at',)),
+        ]
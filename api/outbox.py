@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from api.models import EmailOutbox
+
+
+class OutboxDispatcher:
+    """
+    Отправка писем из EmailOutbox через одно постоянное соединение с почтовым сервером.
+
+    Письма забираются пакетами, неудачные отправки повторяются с экспоненциальной задержкой,
+    после EMAIL_OUTBOX['MAX_ATTEMPTS'] попыток письмо помечается как failed.
+
+    Письмо захватывается коротким UPDATE, который переносит next_attempt_at на EMAIL_OUTBOX['LEASE']
+    секунд вперед, а отправляется вне транзакции: запись в базе не ждет почтового сервера. Результат
+    каждой отправки записывается отдельно. Если процесс упадет между отправкой и записью, письмо
+    будет отправлено повторно после окончания аренды.
+
+    Methods:
+        - dispatch: Отправить один пакет писем
+        - close: Закрыть соединение с почтовым сервером
+    """
+
+    def __init__(self, batch_size=None, connection=None):
+        self.batch_size = batch_size or settings.EMAIL_OUTBOX['BATCH_SIZE']
+        self.connection = connection or get_connection()
+        self.opened = False
+
+    def dispatch(self):
+        """
+        Отправляет пакет писем, время следующей попытки которых наступило.
+
+        Returns:
+            int: Количество отправленных писем.
+        """
+        sent = 0
+        for message in self.claim():
+            try:
+                self._open()
+                self.connection.send_messages([EmailMessage(
+                    message.subject, message.body, message.from_email or None, message.to,
+                    connection=self.connection)])
+            except Exception as error:
+                self._failed(message, error)
+                self.close()
+            else:
+                EmailOutbox.objects.filter(id=message.id).update(
+                    status='sent', sent_at=timezone.now(), attempts=F('attempts') + 1)
+                sent += 1
+        return sent
+
+    def claim(self):
+        """
+        Захватывает пакет писем. Каждое письмо захватывается отдельным условным UPDATE по прочитанному
+        next_attempt_at, поэтому другой обработчик не заберет то же письмо, а блокировка записи
+        держится только на время одного UPDATE.
+
+        Returns:
+            list: Захваченные письма.
+        """
+        now = timezone.now()
+        lease_until = now + timedelta(seconds=settings.EMAIL_OUTBOX['LEASE'])
+        candidates = EmailOutbox.objects.filter(status='pending', next_attempt_at__lte=now).order_by('id')
+        return [message for message in candidates[:self.batch_size] if EmailOutbox.objects.filter(
+            id=message.id, status='pending', next_attempt_at=message.next_attempt_at,
+        ).update(next_attempt_at=lease_until)]
+
+    def close(self):
+        if self.opened:
+            try:
+                self.connection.close()
+            finally:
+                self.opened = False
+
+    def _open(self):
+        if not self.opened:
+            self.connection.open()
+            self.opened = True
+
+    def _failed(self, message, error):
+        options = settings.EMAIL_OUTBOX
+        fields = {'last_error': str(error), 'attempts': message.attempts + 1}
+        if message.attempts + 1 >= options['MAX_ATTEMPTS']:
+            fields['status'] = 'failed'
+        else:
+            delay = min(options['RETRY_DELAY'] * 2 ** message.attempts, options['MAX_RETRY_DELAY'])
+            fields['next_attempt_at'] = timezone.now() + timedelta(seconds=delay)
+        EmailOutbox.objects.filter(id=message.id).update(**fields)
@@ -0,0 +1,114 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination:
+    """
+    Пагинация по ключу сортировки (keyset).
+
+    Курсор хранит значения полей сортировки последней строки страницы, и следующая страница
+    выбирается условием WHERE (поля) > (значения курсора) по индексу, поэтому дальние страницы
+    стоят столько же, сколько первая. Последнее поле сортировки должно быть уникальным.
+
+    Methods:
+        - paginate_queryset: Вернуть строки текущей страницы
+        - get_next_link: Ссылка на следующую страницу
+        - get_last_cursor: Курсор последней строки страницы, для опроса новых строк
+
+    Attributes:
+        - ordering: Поля сортировки, например ('-dt', '-id')
+        - page_size: Количество строк на странице
+        - cursor_query_param: Параметр запроса с курсором
+    """
+
+    def __init__(self, ordering=('id',), page_size=None, cursor_query_param='cursor'):
+        self.ordering = ordering
+        self.page_size = page_size or api_settings.PAGE_SIZE
+        self.cursor_query_param = cursor_query_param
+        self.request = None
+        self.cursor = None
+        self.next_position = None
+        self.last_position = None
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        queryset = queryset.order_by(*self.ordering)
+        self.cursor = request.query_params.get(self.cursor_query_param)
+        if self.cursor:
+            queryset = queryset.filter(self.after(self.decode_cursor(self.cursor, queryset.model)))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.last_position = self.position(rows[-1]) if rows else None
+        self.next_position = self.last_position if has_next else None
+        return rows
+
+    def after(self, position):
+        """
+        Условие для строк, идущих в сортировке после position
+        """
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': position[index]})
+            for previous, value in zip(self.ordering[:index], position):
+                step &= Q(**{previous.lstrip('-'): value})
+            condition |= step
+        return condition
+
+    def position(self, row):
+        if isinstance(row, dict):
+            values = [row[field.lstrip('-')] for field in self.ordering]
+        else:
+            values = [getattr(row, field.lstrip('-')) for field in self.ordering]
+        # Даты сохраняются с микросекундами, иначе строки с одинаковыми миллисекундами пропускались бы
+        return [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+
+    def encode_cursor(self, position):
+        return urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, cursor, model):
+        """
+        Разбирает курсор и приводит его значения к типам полей сортировки модели.
+
+        Raises:
+            NotFound: Курсор поврежден или его значения не подходят к полям сортировки.
+        """
+        try:
+            position = json.loads(urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError):
+            raise NotFound('Неверный курсор')
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound('Неверный курсор')
+        try:
+            values = [model._meta.get_field(field.lstrip('-')).to_python(value)
+                      for field, value in zip(self.ordering, position)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound('Неверный курсор')
+        if any(value is None for value in values):
+            raise NotFound('Неверный курсор')
+        return values
+
+    def get_next_cursor(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_last_cursor(self):
+        if self.last_position is None:
+            return self.cursor
+        return self.encode_cursor(self.last_position)
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
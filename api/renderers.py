@@ -0,0 +1,117 @@
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+_django_encoder = DjangoJSONEncoder()
+
+
+def _default(obj):
+    """
+    Кодирует то, что быстрые библиотеки не знают, так же как DjangoJSONEncoder:
+    даты, Decimal, UUID, ленивые строки перевода
+    """
+    return _django_encoder.default(obj)
+
+
+def _orjson_dumps(data):
+    return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _ujson_dumps(data):
+    return ujson.dumps(data, ensure_ascii=False, escape_forward_slashes=False, default=_default).encode()
+
+
+def _json_dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+JSON_BACKENDS = {
+    'orjson': (orjson and _orjson_dumps, orjson and orjson.loads),
+    'ujson': (ujson and _ujson_dumps, ujson and ujson.loads),
+    'json': (_json_dumps, json.loads),
+}
+
+
+def available_json_backends():
+    return [name for name, (dumps, _) in JSON_BACKENDS.items() if dumps]
+
+
+def get_json_backend(name=None):
+    """
+    Возвращает (название, dumps, loads) библиотеки JSON.
+
+    Args:
+        name (str): orjson, ujson, json или auto - первая установленная по порядку.
+            По умолчанию settings.JSON_BACKEND. Если библиотека не установлена, используется json.
+    """
+    name = name or settings.JSON_BACKEND
+    candidates = available_json_backends() if name == 'auto' else [name]
+    for candidate in candidates:
+        dumps, loads = JSON_BACKENDS.get(candidate, (None, None))
+        if dumps:
+            return candidate, dumps, loads
+    return 'json', _json_dumps, json.loads
+
+
+JSON_BACKEND, json_dumps, json_loads = get_json_backend()
+
+
+class FastJSONRenderer(BaseRenderer):
+    """
+    Рендерер DRF через orjson/ujson с откатом на стандартный json.
+    Возвращает компактный UTF-8 без экранирования кириллицы.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json_dumps(data)
+
+
+class FastJSONParser(BaseParser):
+    """
+    Парсер тела запроса DRF через orjson/ujson с откатом на стандартный json
+    """
+    media_type = 'application/json'
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return json_loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class JsonResponse(HttpResponse):
+    """
+    Замена django.http.JsonResponse с теми же аргументами, кодирующая данные быстрой библиотекой JSON.
+    encoder и json_dumps_params используются только при откате на стандартный json.
+    """
+
+    def __init__(self, data, encoder=DjangoJSONEncoder, safe=True, json_dumps_params=None, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        if json_dumps_params or encoder is not DjangoJSONEncoder:
+            content = json.dumps(data, cls=encoder, **(json_dumps_params or {}))
+        else:
+            content = json_dumps(data)
+        super().__init__(content=content, **kwargs)
@@ -0,0 +1,192 @@
+import re
+from functools import reduce
+from operator import and_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from api.models import ProductInfo, ProductParameter, Shop
+from api.utils import chunked
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def product_documents(product_info_ids):
+    """
+    Возвращает {id ProductInfo: (продукт, название, модель, категория, параметры)} для индексации
+    """
+    documents = {
+        product_info_id: [product, name, model, category, []]
+        for product_info_id, product, name, model, category in ProductInfo.objects.filter(
+            id__in=product_info_ids).values_list('id', 'product__name', 'name', 'model', 'product__category__name')
+    }
+    for product_info_id, parameter, value in ProductParameter.objects.filter(
+            product_info_id__in=product_info_ids).values_list('product_info_id', 'parameter__name', 'value'):
+        documents[product_info_id][4].append(f'{parameter} {value}')
+    return {product_info_id: (*fields[:4], ' '.join(fields[4])) for product_info_id, fields in documents.items()}
+
+
+class SearchBackend:
+    """
+    Базовый класс поискового индекса каталога.
+
+    Methods:
+        - index: Добавить или обновить товары в индексе
+        - remove: Удалить товары из индекса
+        - rebuild: Перестроить индекс по всему каталогу
+        - search: Найти id ProductInfo магазинов, принимающих заказы, отсортированные по релевантности
+    """
+
+    def index(self, product_info_ids):
+        pass
+
+    def remove(self, product_info_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, query, limit):
+        raise NotImplementedError
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """
+    Поиск без отдельного индекса через icontains, для баз без полнотекстового поиска.
+
+    Каждый запрос просматривает все товары с параметрами, ищет подстроку, а не начало слова,
+    и не сортирует по релевантности, поэтому на большом каталоге не подходит для рабочего окружения
+    и по умолчанию не выбирается.
+    """
+    search_fields = ('product__name', 'name', 'model', 'product__category__name',
+                     'product_details__parameter__name', 'product_details__value')
+
+    def search(self, query, limit):
+        tokens = TOKEN_RE.findall(query)
+        if not tokens:
+            return []
+        conditions = [reduce(lambda left, right: left | right,
+                             (Q(**{f'{field}__icontains': token}) for field in self.search_fields))
+                      for token in tokens]
+        return list(ProductInfo.objects.filter(reduce(and_, conditions), shop__status=True).order_by(
+            'id').values_list('id', flat=True).distinct()[:limit])
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """
+    Полнотекстовый индекс SQLite FTS5.
+
+    Таблица индекса хранит по строке на ProductInfo (rowid = id), префиксные индексы FTS5
+    ускоряют поиск по началу слова, а результаты сортируются по bm25.
+    Таблица создается миграцией api.0002_productinfo_search.
+    """
+    table = 'api_productinfo_search'
+    columns = ('product', 'name', 'model', 'category', 'parameters')
+
+    def index(self, product_info_ids):
+        for batch in chunked(product_info_ids, settings.CATALOG_IMPORT_BATCH_SIZE):
+            documents = product_documents(batch)
+            self._delete(batch)
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f"INSERT INTO {self.table} (rowid, {', '.join(self.columns)}) VALUES (%s, %s, %s, %s, %s, %s)",
+                    [(product_info_id, *fields) for product_info_id, fields in documents.items()])
+
+    def remove(self, product_info_ids):
+        for batch in chunked(product_info_ids, settings.CATALOG_IMPORT_BATCH_SIZE):
+            self._delete(batch)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+        self.index(ProductInfo.objects.values_list('id', flat=True).iterator())
+
+    def search(self, query, limit):
+        tokens = TOKEN_RE.findall(query)
+        if not tokens:
+            return []
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {self.table}.rowid FROM {self.table} '
+                f'JOIN {ProductInfo._meta.db_table} product_info ON product_info.id = {self.table}.rowid '
+                f'JOIN {Shop._meta.db_table} shop ON shop.id = product_info.shop_id '
+                f'WHERE {self.table} MATCH %s AND shop.status ORDER BY {self.table}.rank LIMIT %s',
+                [match, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def _delete(self, product_info_ids):
+        if not product_info_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid IN ({", ".join(["%s"] * len(product_info_ids))})',
+                           list(product_info_ids))
+
+
+class PostgreSQLSearchBackend(SearchBackend):
+    """
+    Полнотекстовый поиск PostgreSQL.
+
+    Таблица индекса хранит tsvector по строке на ProductInfo и GIN-индекс по нему. Названия продукта
+    и товара весят больше модели, категории и параметров. Поиск идет по началу слов (to_tsquery 'слово:*'),
+    результаты сортируются по ts_rank. Таблица создается миграцией api.0005_productinfo_search_postgresql,
+    товары, загруженные до нее, добавляются в индекс командой rebuild_search_index.
+    """
+    table = 'api_productinfo_search'
+    config = 'simple'
+
+    def index(self, product_info_ids):
+        document = ' || '.join(f"setweight(to_tsvector('{self.config}', %s), '{weight}')" for weight in 'AABCD')
+        for batch in chunked(product_info_ids, settings.CATALOG_IMPORT_BATCH_SIZE):
+            documents = product_documents(batch)
+            self._delete(set(batch) - set(documents))
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {self.table} (product_info_id, document) VALUES (%s, {document}) '
+                    f'ON CONFLICT (product_info_id) DO UPDATE SET document = EXCLUDED.document',
+                    [(product_info_id, *fields) for product_info_id, fields in documents.items()])
+
+    def remove(self, product_info_ids):
+        for batch in chunked(product_info_ids, settings.CATALOG_IMPORT_BATCH_SIZE):
+            self._delete(batch)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+        self.index(ProductInfo.objects.values_list('id', flat=True).iterator())
+
+    def search(self, query, limit):
+        tokens = TOKEN_RE.findall(query)
+        if not tokens:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT search.product_info_id FROM {self.table} search '
+                f'JOIN {ProductInfo._meta.db_table} product_info ON product_info.id = search.product_info_id '
+                f'JOIN {Shop._meta.db_table} shop ON shop.id = product_info.shop_id, '
+                f"to_tsquery('{self.config}', %s) query "
+                f'WHERE search.document @@ query AND shop.status '
+                f'ORDER BY ts_rank(search.document, query) DESC, search.product_info_id LIMIT %s',
+                [' & '.join(f'{token}:*' for token in tokens), limit])
+            return [row[0] for row in cursor.fetchall()]
+
+    def _delete(self, product_info_ids):
+        if not product_info_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE product_info_id = ANY(%s)', [list(product_info_ids)])
+
+
+_backend = None
+
+
+def get_search_backend():
+    """
+    Возвращает поисковый индекс, заданный в CATALOG_SEARCH_BACKEND
+    """
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.CATALOG_SEARCH_BACKEND)()
+    return _backend
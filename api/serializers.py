@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from api.models import Category, Shop, Product, ProductParameter, ProductInfo, Parameter, Order, OrderItem, Contact, \
-    User
+    User, ImportJob
 
 
 class ContactSerializer(serializers.ModelSerializer):
@@ -52,7 +52,7 @@ class ProductParameterSerializer(serializers.ModelSerializer):
 
 class ProductInfoSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
-    product_parameters = ProductParameterSerializer(read_only=True, many=True)
+    product_parameters = ProductParameterSerializer(source='product_details', read_only=True, many=True)
 
     name = serializers.StringRelatedField()
     quantity = serializers.IntegerField()
@@ -72,8 +72,6 @@ class ParameterSerializer(serializers.ModelSerializer):
 
 
 class OrderSerializer(serializers.ModelSerializer):
-    total_sum = serializers.IntegerField()
-
     class Meta:
         model = Order
         fields = '__all__'
@@ -85,3 +83,22 @@ class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = '__all__'
+
+
+class ShopOrderSerializer(serializers.ModelSerializer):
+    """
+    Заказ с позициями одного магазина из Prefetch(to_attr='shop_items').
+    Ответ api/v1/shop/orders/ строит fast_serializers.shop_order_data, сериализатор остается эталоном формата
+    """
+    items = OrderItemSerializer(source='shop_items', many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = '__all__'
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = ('id', 'url', 'status', 'rows_processed', 'rows_per_sec', 'errors',
+                  'created_at', 'started_at', 'finished_at')
@@ -0,0 +1,97 @@
+from collections import defaultdict
+
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+
+from api.models import OrderItem, ProductInfo, Shop
+
+
+class StockError(ValueError):
+    """
+    Недостаточно товара на складе магазина
+    """
+
+
+def order_stock(order_id):
+    """
+    Возвращает {id магазина: {id ProductInfo: количество}} для позиций заказа.
+
+    Позиция заказа ссылается на продукт и магазин, поэтому списывается первое по id предложение
+    магазина — то же, цену которого фиксирует корзина.
+    """
+    wanted = defaultdict(int)
+    for product_id, shop_id, quantity in OrderItem.objects.filter(order_id=order_id).values_list(
+            'product_id', 'shop_id', 'quantity'):
+        wanted[(product_id, shop_id)] += quantity
+    if not wanted:
+        return {}
+
+    offers = {}
+    for product_info_id, product_id, shop_id in ProductInfo.objects.filter(
+            shop_id__in={shop_id for _, shop_id in wanted},
+            product_id__in={product_id for product_id, _ in wanted}).order_by('id').values_list(
+            'id', 'product_id', 'shop_id'):
+        offers.setdefault((product_id, shop_id), product_info_id)
+
+    stock = defaultdict(dict)
+    for (product_id, shop_id), quantity in wanted.items():
+        stock[shop_id][offers.get((product_id, shop_id))] = quantity
+    return stock
+
+
+def _amount(quantities):
+    return Case(*[When(id=product_info_id, then=Value(quantity)) for product_info_id, quantity in quantities.items()],
+                output_field=PositiveIntegerField())
+
+
+def bump_catalog_version(shop_id):
+    Shop.objects.filter(id=shop_id).update(catalog_version=F('catalog_version') + 1)
+
+
+def reserve_stock(order_id):
+    """
+    Списывает со склада товары заказа одним условным UPDATE на магазин.
+
+    UPDATE уменьшает quantity только у строк, где товара хватает, и число обновленных строк
+    сравнивается с числом позиций магазина, поэтому параллельные заказы не уводят остаток в минус.
+    Магазины обходятся по возрастанию id, чтобы параллельные заказы блокировали строки в одном порядке.
+    Вызывается внутри transaction.atomic: исключение откатывает уже списанное.
+    Остатки видны в каталоге, поэтому версия каталога магазина увеличивается и кэш каталога сбрасывается.
+
+    Raises:
+        StockError: Какого-то товара не хватает или у магазина больше нет такого предложения.
+    """
+    for shop_id, quantities in sorted(order_stock(order_id).items()):
+        if None in quantities:
+            raise StockError(f'Магазин {shop_id} больше не продает часть товаров заказа')
+        amount = _amount(quantities)
+        if ProductInfo.objects.filter(id__in=quantities, quantity__gte=amount).update(
+                quantity=F('quantity') - amount) != len(quantities):
+            raise StockError(f'Недостаточно товара в магазине {shop_id}')
+        bump_catalog_version(shop_id)
+
+
+def release_stock(order_id):
+    """
+    Возвращает на склад товары отмененного заказа одним UPDATE на магазин и увеличивает версию его каталога
+    """
+    for shop_id, quantities in sorted(order_stock(order_id).items()):
+        quantities.pop(None, None)
+        if quantities:
+            amount = _amount(quantities)
+            ProductInfo.objects.filter(id__in=quantities).update(quantity=F('quantity') + amount)
+            bump_catalog_version(shop_id)
+
+
+def stock_shortages(order_id):
+    """
+    Возвращает позиции заказа, которых не хватает на складе.
+    Вызывается после отката неудачного резервирования, чтобы сообщить покупателю, что именно закончилось.
+    """
+    shortages = []
+    for shop_id, quantities in sorted(order_stock(order_id).items()):
+        available = dict(ProductInfo.objects.filter(id__in=quantities).values_list('id', 'quantity'))
+        shortages.extend({'shop': shop_id, 'product_info': product_info_id, 'quantity': quantity,
+                          'available': available.get(product_info_id, 0)}
+                         for product_info_id, quantity in quantities.items()
+                         if available.get(product_info_id, 0) < quantity)
+    return shortages
@@ -1,3 +1,713 @@
-from django.test import TestCase
+import json
+import threading
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from base64 import urlsafe_b64encode
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Prefetch
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+from api.authentication import CachedTokenAuthentication, token_cache_key
+from api.basket import add_items
+from api.fast_serializers import ORDER_ITEM_VALUES, ORDER_VALUES, PRODUCT_INFO_VALUES, order_data, \
+    order_item_data, product_info_data, shop_order_data
+from api.imports import CatalogImporter
+from api.jobs import claim_import_job, import_shop_feed, run_import_job
+from api.models import Category, Contact, EmailOutbox, FeedCache, IdempotencyKey, ImportJob, Order, OrderItem, \
+    Parameter, Product, ProductInfo, ProductParameter, Shop, User
+from api.serializers import OrderItemSerializer, OrderSerializer, ProductInfoSerializer, ShopOrderSerializer
+from api.outbox import OutboxDispatcher
+from api.renderers import available_json_backends, get_json_backend
+from api.stock import reserve_stock
+from api.throttling import client_ip, throttle_login
+from api.tokens import TokenError, decode, refresh_token
+
+
+class StockReservationTest(TransactionTestCase):
+    """
+    Параллельное оформление заказов на один товар с ограниченным остатком
+    """
+    buyers = 8
+    stock = 3
+
+    def setUp(self):
+        shop = Shop.objects.create(name='Магазин', url='https://shop.example/feed.yaml')
+        product = Product.objects.create(category=Category.objects.create(name='Смартфоны'), name='Телефон')
+        self.offer = ProductInfo.objects.create(product=product, shop=shop, name='Телефон',
+                                                quantity=self.stock, price=100)
+        self.checkouts = []
+        for index in range(self.buyers):
+            user = User.objects.create_user(f'buyer{index}@example.com', 'password', is_active=True)
+            contact = Contact.objects.create(user=user, type_contact='phone', phone='+70000000000')
+            order = Order.objects.create(user=user, status='basket', total_sum=100)
+            OrderItem.objects.create(order=order, product=product, shop=shop, quantity=1, price=100)
+            self.checkouts.append((user, {'order': order.id, 'contact': contact.id}))
+
+    def test_concurrent_checkouts_never_oversell(self):
+        barrier = threading.Barrier(self.buyers)
+        statuses = []
+
+        def checkout(user, data):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                statuses.append(client.post('/api/v1/user/orders/', data, format='json').status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=checkout_args) for checkout_args in self.checkouts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [200] * self.stock + [409] * (self.buyers - self.stock))
+        self.assertEqual(Order.objects.filter(status='order').count(), self.stock)
+        self.offer.refresh_from_db()
+        self.assertEqual(self.offer.quantity, 0)
+
+
+class BasketOfferTest(TestCase):
+    """
+    Корзина фиксирует цену того же предложения магазина, с которого списывается остаток
+    """
+
+    def test_price_and_stock_use_same_offer(self):
+        shop = Shop.objects.create(name='Магазин', url='https://shop.example/feed.yaml')
+        product = Product.objects.create(category=Category.objects.create(name='Смартфоны'), name='Телефон')
+        first = ProductInfo.objects.create(product=product, shop=shop, external_id=2, quantity=5, price=300)
+        second = ProductInfo.objects.create(product=product, shop=shop, external_id=1, quantity=5, price=100)
+        user = User.objects.create_user('buyer@example.com', 'password', is_active=True)
+        basket = Order.objects.create(user=user, status='basket')
+
+        add_items(basket, {(product.id, shop.id): 2})
+        reserve_stock(basket.id)
+
+        self.assertEqual(OrderItem.objects.get(order=basket).price, first.price)
+        self.assertEqual(ProductInfo.objects.get(id=first.id).quantity, 3)
+        self.assertEqual(ProductInfo.objects.get(id=second.id).quantity, 5)
+
+
+class CatalogImporterTest(TestCase):
+    """
+    Повторный импорт прайс-листа: удаление пропавших товаров и строки с ошибками
+    """
+
+    def setUp(self):
+        self.shop = Shop.objects.create(name='Магазин', url='https://shop.example/feed.yaml')
+        self.categories = [{'id': 1, 'name': 'Смартфоны'}]
+        CatalogImporter(self.shop).run(self.categories, [
+            {'id': 1, 'category': 1, 'name': 'Телефон', 'price': 100, 'quantity': 1},
+            {'id': 2, 'category': 1, 'name': 'Планшет', 'price': 200, 'quantity': 1},
+            {'id': 3, 'category': 1, 'name': 'Часы', 'price': 300, 'quantity': 1},
+        ])
+
+    def test_invalid_row_keeps_existing_offer(self):
+        stats = CatalogImporter(self.shop).run(self.categories, [
+            {'id': 1, 'category': 1, 'name': 'Телефон', 'price': 100, 'quantity': 1},
+            {'id': 2, 'category': 1, 'name': 'Планшет', 'quantity': 1},
+        ])
+
+        self.assertEqual(stats['deleted'], 1)
+        self.assertEqual(stats['errors'], ['Товар 2: нет полей price'])
+        self.assertEqual(sorted(ProductInfo.objects.values_list('external_id', 'price')), [(1, 100), (2, 200)])
+
+
+class JSONBackendsTest(TestCase):
+    """
+    Установленные библиотеки JSON кодируют ответы байт в байт как стандартный json
+    """
+
+    def test_backends_match_json(self):
+        data = {'next': 'http://testserver/api/v1/user/product/?cursor=a%2Fb', 'name': 'Телефон', 'count': 1}
+        _, json_dumps, _ = get_json_backend('json')
+        for name in available_json_backends():
+            with self.subTest(backend=name):
+                self.assertEqual(get_json_backend(name)[1](data), json_dumps(data))
+
+
+class OrdersETagTest(TestCase):
+    """
+    ETag списка заказов различается для JSON и Browsable API
+    """
+
+    def test_etag_is_per_representation(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('buyer@example.com', 'password', is_active=True))
+        html = client.get('/api/v1/user/orders/', HTTP_ACCEPT='text/html')
+
+        response = client.get('/api/v1/user/orders/', HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=html['ETag'])
+        not_modified = client.get('/api/v1/user/orders/', HTTP_ACCEPT='application/json',
+                                  HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('Accept', not_modified['Vary'])
+
+
+class ProductSearchTest(TestCase):
+    """
+    Поиск по началу слов отдает полную страницу товаров магазинов, принимающих заказы
+    """
+
+    def setUp(self):
+        self.shops = [Shop.objects.create(name=name, url=f'https://{name}.example/feed.yaml') for name in ('a', 'b')]
+        for price, shop in zip((100, 200), self.shops):
+            CatalogImporter(shop).run([{'id': 1, 'name': 'Смартфоны'}], [
+                {'id': 1, 'category': 1, 'name': 'Телефон', 'model': 'x1', 'price': price, 'quantity': 1}])
+        Shop.objects.filter(id=self.shops[0].id).update(status=False)
+
+    def test_inactive_shops_do_not_shorten_page(self):
+        response = self.client.get('/api/v1/user/product/search/', {'q': 'теле', 'limit': 1})
+
+        self.assertEqual([row['price'] for row in response.json()['results']], [200])
+
+
+class CatalogCacheTest(TestCase):
+    """
+    Кэш ответов каталога: формат ответа и версии магазинов
+    """
+
+    def setUp(self):
+        caches['catalog'].clear()
+        self.category = Category.objects.create(id=1, name='Смартфоны')
+        self.shops = [Shop.objects.create(name=name, url=f'https://{name}.example/feed.yaml') for name in ('a', 'b')]
+        for shop in self.shops:
+            CatalogImporter(shop).run([{'id': 1, 'name': 'Смартфоны'}], [
+                {'id': 1, 'category': 1, 'name': 'Телефон', 'price': 100, 'quantity': 1}])
+
+    def test_html_is_not_served_to_json_clients(self):
+        html = self.client.get('/api/v1/user/categories/', HTTP_ACCEPT='text/html')
+        response = self.client.get('/api/v1/user/categories/', HTTP_ACCEPT='application/json')
+
+        self.assertTrue(html['Content-Type'].startswith('text/html'))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()['results'], [{'id': 1, 'name': 'Смартфоны'}])
+        self.assertIn('Accept', html['Vary'])
+        self.assertIn('Accept', response['Vary'])
+
+    def test_shared_category_rename_invalidates_other_shops(self):
+        url = f'/api/v1/user/product/?shop={self.shops[0].id}'
+        self.assertEqual(self.client.get(url).json()['results'][0]['product']['category'], 'Смартфоны')
+
+        CatalogImporter(self.shops[1]).run([{'id': 1, 'name': 'Телефоны'}], [
+            {'id': 1, 'category': 1, 'name': 'Телефон', 'price': 100, 'quantity': 1}])
+
+        self.assertEqual(self.client.get(url).json()['results'][0]['product']['category'], 'Телефоны')
+
+    def test_stock_reservation_invalidates_shop_catalog(self):
+        url = f'/api/v1/user/product/?shop={self.shops[0].id}'
+        self.assertEqual(self.client.get(url).json()['results'][0]['quantity'], 1)
+        user = User.objects.create_user('buyer@example.com', 'password', is_active=True)
+        order = Order.objects.create(user=user, status='basket')
+        add_items(order, {(Product.objects.get().id, self.shops[0].id): 1})
+
+        reserve_stock(order.id)
+
+        self.assertEqual(self.client.get(url).json()['results'][0]['quantity'], 0)
+
+    def test_etag_is_per_representation(self):
+        etag = self.client.get('/api/v1/user/categories/', HTTP_ACCEPT='application/json')['ETag']
+
+        html = self.client.get('/api/v1/user/categories/', HTTP_ACCEPT='text/html', HTTP_IF_NONE_MATCH=etag)
+        not_modified = self.client.get('/api/v1/user/categories/', HTTP_ACCEPT='application/json',
+                                       HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(html.status_code, 200)
+        self.assertTrue(html['Content-Type'].startswith('text/html'))
+        self.assertNotEqual(html.get('ETag'), etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('Accept', not_modified['Vary'])
+
+
+@override_settings(SHOP_ORDERS_POLL_DELAY=0)
+class ShopOrdersFeedTest(TestCase):
+    """
+    Лента заказов магазина: опрос по курсору since и фильтр по датам
+    """
+
+    def setUp(self):
+        owner = User.objects.create_user('shop@example.com', 'password', is_active=True, type='shop')
+        self.shop = Shop.objects.create(name='Магазин', url='https://shop.example/feed.yaml', user=owner)
+        self.product = Product.objects.create(category=Category.objects.create(name='Смартфоны'), name='Телефон')
+        self.buyer = User.objects.create_user('buyer@example.com', 'password', is_active=True)
+        self.client = APIClient()
+        self.client.force_authenticate(owner)
+
+    def order(self, status, dt, updated_at):
+        order = Order.objects.create(user=self.buyer, status=status)
+        OrderItem.objects.create(order=order, product=self.product, shop=self.shop, quantity=1, price=100)
+        Order.objects.filter(id=order.id).update(dt=dt, updated_at=updated_at)
+        return order
+
+    def poll(self, cursor=''):
+        return self.client.get('/api/v1/shop/orders/', {'since': cursor}).json()
+
+    def test_basket_created_before_cursor_is_delivered_after_checkout(self):
+        day = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+        late_checkout = self.order('basket', day, day)
+        first = self.order('order', day + timedelta(hours=1), day + timedelta(hours=1))
+
+        page = self.poll()
+        self.assertEqual([order['id'] for order in page['results']], [first.id])
+
+        Order.objects.filter(id=late_checkout.id).update(status='order', updated_at=day + timedelta(hours=2))
+        page = self.poll(page['cursor'])
+        self.assertEqual([order['id'] for order in page['results']], [late_checkout.id])
+        self.assertEqual(self.poll(page['cursor'])['results'], [])
+
+    def test_date_to_includes_whole_day(self):
+        day = datetime(2024, 5, 1, 18, tzinfo=timezone.utc)
+        order = self.order('order', day, day)
+        self.order('order', day + timedelta(days=1), day + timedelta(days=1))
+
+        response = self.client.get('/api/v1/shop/orders/', {'date_from': '2024-05-01', 'date_to': '2024-05-01'})
+        self.assertEqual([result['id'] for result in response.json()['results']], [order.id])
+
+
+class FastSerializersParityTest(TestCase):
+    """
+    Сериализация строк values() совпадает с выводом сериализаторов DRF для тех же строк
+    """
+
+    def setUp(self):
+        self.shop = Shop.objects.create(name='Магазин', url='https://shop.example/feed.yaml')
+        other_shop = Shop.objects.create(name='Другой', url='https://other.example/feed.yaml')
+        product = Product.objects.create(category=Category.objects.create(name='Смартфоны'), name='Телефон')
+        parameter = Parameter.objects.create(name='Цвет')
+        with_parameters = ProductInfo.objects.create(product=product, shop=self.shop, name='Телефон 64GB',
+                                                     quantity=3, price=100)
+        ProductParameter.objects.create(product_info=with_parameters, parameter=parameter, value='черный')
+        ProductParameter.objects.create(product_info=with_parameters,
+                                        parameter=Parameter.objects.create(name='Память'), value='64')
+        ProductInfo.objects.create(product=product, shop=self.shop, name='', quantity=0, price=90)
+
+        user = User.objects.create_user('buyer@example.com', 'password', is_active=True)
+        contact = Contact.objects.create(user=user, type_contact='phone', phone='+70000000000')
+        moments = [datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+                   datetime(2024, 5, 1, 23, 59, 59, 999999, tzinfo=timezone.utc),
+                   datetime(2024, 5, 2, 0, 0, tzinfo=timezone.utc)]
+        for index, moment in enumerate(moments):
+            order = Order.objects.create(user=user, status='order', total_sum=100 * index,
+                                         contact=contact if index else None)
+            Order.objects.filter(id=order.id).update(dt=moment, updated_at=moment + timedelta(microseconds=7))
+            OrderItem.objects.create(order=order, product=product, shop=self.shop, quantity=index + 1, price=100)
+            OrderItem.objects.create(order=order, product=product, shop=other_shop, quantity=1, price=50)
+
+    def assertSameJSON(self, fast, serialized):
+        self.assertEqual(json.dumps(fast, ensure_ascii=False), json.dumps(serialized, ensure_ascii=False))
+
+    def test_product_info_data(self):
+        queryset = ProductInfo.objects.order_by('id')
+        instances = queryset.select_related('product__category').prefetch_related(Prefetch(
+            'product_details', queryset=ProductParameter.objects.select_related('parameter').order_by('id')))
+        self.assertSameJSON(product_info_data(queryset.values(*PRODUCT_INFO_VALUES)),
+                            ProductInfoSerializer(instances, many=True).data)
+
+    def test_order_data(self):
+        for time_zone in ('UTC', 'Europe/Moscow'):
+            with self.subTest(time_zone=time_zone), self.settings(TIME_ZONE=time_zone):
+                queryset = Order.objects.order_by('id')
+                self.assertSameJSON(order_data(queryset.values(*ORDER_VALUES)),
+                                    OrderSerializer(queryset, many=True).data)
+
+    def test_order_item_data(self):
+        queryset = OrderItem.objects.order_by('id')
+        self.assertSameJSON(order_item_data(queryset.values(*ORDER_ITEM_VALUES)),
+                            OrderItemSerializer(queryset, many=True).data)
+
+    def test_shop_order_data(self):
+        queryset = Order.objects.order_by('id')
+        orders = queryset.prefetch_related(Prefetch(
+            'orderitem_order', queryset=OrderItem.objects.filter(shop_id=self.shop.id).order_by('id'),
+            to_attr='shop_items'))
+        self.assertSameJSON(shop_order_data(queryset.values(*ORDER_VALUES), self.shop.id),
+                            ShopOrderSerializer(orders, many=True).data)
+
+
+class ProductInfoQueriesTest(TestCase):
+    """
+    Список товаров выполняет одинаковое число запросов независимо от размера страницы
+    """
+
+    def setUp(self):
+        self.shop = Shop.objects.create(name='Магазин', url='https://shop.example/feed.yaml')
+        self.category = Category.objects.create(name='Смартфоны')
+        self.parameters = [Parameter.objects.create(name=name) for name in ('Цвет', 'Память')]
+
+    def create_products(self, count):
+        for index in range(count):
+            product = Product.objects.create(category=self.category, name=f'Телефон {index}')
+            product_info = ProductInfo.objects.create(product=product, shop=self.shop, name=product.name,
+                                                      quantity=1, price=100 + index)
+            for parameter in self.parameters:
+                ProductParameter.objects.create(product_info=product_info, parameter=parameter, value=str(index))
+
+    def assertPageQueries(self, size):
+        caches['catalog'].clear()
+        # Версия каталога, страница товаров и параметры всех товаров страницы
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/user/product/')
+        self.assertEqual(len(response.json()['results']), size)
+        self.assertEqual(len(response.json()['results'][-1]['product_parameters']), len(self.parameters))
+
+    def test_same_queries_for_one_item_and_full_page(self):
+        self.create_products(1)
+        self.assertPageQueries(1)
+        self.create_products(api_settings.PAGE_SIZE)
+        self.assertPageQueries(api_settings.PAGE_SIZE)
+
+
+class TokenCacheTest(TestCase):
+    """
+    Снимки пользователей в локальном для процесса кэше живут не дольше LOCAL_TIMEOUT
+    """
+
+    def test_locmem_snapshot_expires_within_local_timeout(self):
+        user = User.objects.create_user('buyer@example.com', 'password', is_active=True)
+        token = Token.objects.create(user=user)
+        cache = caches['auth']
+        cache.clear()
+
+        with patch('django.core.cache.backends.locmem.time.time', return_value=1000.0):
+            CachedTokenAuthentication().authenticate_credentials(token.key)
+        with patch('django.core.cache.backends.locmem.time.time', return_value=1000.0 + 11):
+            self.assertIsNone(cache.get(token_cache_key(token.key)))
+
+
+class LoginThrottleTest(TestCase):
+    """
+    Корзины попыток входа по IP клиента из заголовка доверенного прокси и по email
+    """
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.options = {**settings.LOGIN_THROTTLE, 'TRUSTED_PROXIES': 1, 'IP_BURST': 100, 'EMAIL_BURST': 2}
+
+    def login_request(self, forwarded):
+        return RequestFactory().post('/api/v1/user/login/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=forwarded)
+
+    def test_client_ip_from_trusted_proxy(self):
+        with self.settings(LOGIN_THROTTLE=self.options):
+            self.assertEqual(client_ip(self.login_request('1.1.1.1, 2.2.2.2')), '2.2.2.2')
+        self.assertEqual(client_ip(self.login_request('1.1.1.1, 2.2.2.2')), '10.0.0.1')
+
+    def test_email_bucket_is_shared_by_clients(self):
+        with self.settings(LOGIN_THROTTLE=self.options):
+            attempts = [throttle_login(self.login_request(f'2.2.2.{index}'), ' Buyer@example.com')
+                        for index in range(3)]
+
+            self.assertEqual(attempts[:2], [0, 0])
+            self.assertGreater(attempts[2], 0)
+            self.assertEqual(throttle_login(self.login_request('2.2.2.3'), 'other@example.com'), 0)
+
+    def test_ip_bucket_is_per_client(self):
+        options = {**self.options, 'IP_BURST': 1, 'EMAIL_BURST': 100}
+        with self.settings(LOGIN_THROTTLE=options):
+            self.assertEqual(throttle_login(self.login_request('1.1.1.1, 2.2.2.2'), 'a@example.com'), 0)
+            self.assertGreater(throttle_login(self.login_request('2.2.2.2'), 'b@example.com'), 0)
+            self.assertEqual(throttle_login(self.login_request('3.3.3.3'), 'b@example.com'), 0)
+
+
+class ReplicaRoutingTest(TestCase):
+    """
+    Чтение представлений каталога и заказов с реплик и закрепление пользователя после записи
+    """
+
+    def setUp(self):
+        caches['replica_pin'].clear()
+        self.users = [User.objects.create_user(f'buyer{index}@example.com', 'password', is_active=True)
+                      for index in range(2)]
+        self.clients = []
+        for user in self.users:
+            client = APIClient()
+            client.force_authenticate(user)
+            self.clients.append(client)
+
+    def replica_reads(self, client, method, url, **kwargs):
+        with patch('api.db.replica_aliases', return_value=['replica_0']), \
+                patch('api.db.random.choice', return_value='default') as choice:
+            getattr(client, method)(url, **kwargs)
+        return choice.call_count
+
+    def test_only_read_views_use_replicas(self):
+        self.assertTrue(self.replica_reads(self.clients[0], 'get', '/api/v1/user/orders/'))
+        self.assertFalse(self.replica_reads(self.clients[0], 'get', '/api/v1/user/basket/'))
+        self.assertFalse(self.replica_reads(self.clients[0], 'get', '/api/v1/user/shops/'))
+
+    def test_writer_is_pinned_to_primary(self):
+        self.replica_reads(self.clients[0], 'delete', '/api/v1/user/basket/',
+                           data={'items': [{'product': 1, 'shop': 1}]}, format='json')
+
+        self.assertFalse(self.replica_reads(self.clients[0], 'get', '/api/v1/user/orders/'))
+        self.assertTrue(self.replica_reads(self.clients[1], 'get', '/api/v1/user/orders/'))
+
+
+class CursorPaginationTest(TestCase):
+    """
+    Поврежденный курсор отклоняется ответом 404, а не ошибкой сервера
+    """
+
+    def test_malformed_cursors(self):
+        owner = User.objects.create_user('shop@example.com', 'password', is_active=True, type='shop')
+        Shop.objects.create(name='Магазин', url='https://shop.example/feed.yaml', user=owner)
+        client = APIClient()
+        client.force_authenticate(owner)
+        cursors = [json.dumps(position) for position in (['abc'], [None], [[1]], [{'id': 1}], [1, 2], 'abc')]
+        cursors = [urlsafe_b64encode(cursor.encode()).decode() for cursor in cursors] + ['@@@', 'e30=']
+
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/api/v1/user/product/', {'cursor': cursor}).status_code, 404)
+        for position in (['abc', 1], ['2024-05-01T00:00:00+00:00', 'abc'], [1, 1]):
+            cursor = urlsafe_b64encode(json.dumps(position).encode()).decode()
+            with self.subTest(position=position):
+                self.assertEqual(client.get('/api/v1/shop/orders/', {'since': cursor}).status_code, 404)
+
+
+class SignedTokenTest(TestCase):
+    """
+    Поврежденные подписанные токены отклоняются ответом 401, а не ошибкой сервера
+    """
+
+    def test_non_ascii_tokens(self):
+        with self.assertRaises(TokenError):
+            decode('a.b.cé', 'access')
+
+        response = self.client.get('/api/v1/user/orders/', HTTP_AUTHORIZATION='Bearer a.b.cé')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post('/api/v1/user/token/refresh/', {'refresh': 'a.b.cé'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh(self):
+        user = User.objects.create_user('buyer@example.com', 'password', is_active=True)
+        response = self.client.post('/api/v1/user/token/refresh/', {'refresh': refresh_token(user)},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(decode(response.json()['Access'], 'access')['sub'], user.id)
+
+
+FEED_YAML = """name: Связной
+categories:
+  - id: 224
+    name: Смартфоны
+goods:
+  - id: 4216292
+    category: 224
+    model: apple/iphone/xs-max
+    name: Смартфон Apple iPhone XS Max 512GB (золотистый)
+    price: 110000
+    price_rrc: 116990
+    quantity: 14
+    parameters:
+      "Диагональ (дюйм)": 6.5
+      Цвет: золотистый
+""".encode()
+
+
+class IdempotencyKeyTest(TestCase):
+    """
+    Повтор запроса с Idempotency-Key, незавершенные и устаревшие ключи
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('buyer@example.com', 'password', is_active=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, key='order-1'):
+        return self.client.post('/api/v1/user/orders/', {'order': 'x'}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replays_saved_response(self):
+        first = self.post()
+        second = self.post()
+
+        self.assertEqual(second.status_code, first.status_code)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+
+    def test_key_in_progress_is_conflict(self):
+        IdempotencyKey.objects.create(user=self.user, key='order-1', method='POST', path='/api/v1/user/orders/')
+
+        self.assertEqual(self.post().status_code, 409)
+
+    def test_expired_key_runs_request_again(self):
+        self.post()
+        IdempotencyKey.objects.update(created_at=datetime.now(timezone.utc) - timedelta(days=2))
+
+        response = self.post()
+
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_prune_deletes_expired_keys(self):
+        self.post('old')
+        IdempotencyKey.objects.update(created_at=datetime.now(timezone.utc) - timedelta(days=2))
+        self.post('new')
+
+        output = StringIO()
+        call_command('prune_idempotency_keys', stdout=output)
+
+        self.assertIn('1', output.getvalue())
+
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['new'])
+
+
+class OutboxDispatcherTest(TestCase):
+    """
+    Отправка очереди писем: захват пакета, запись результата каждой отправки и повтор после ошибки
+    """
+
+    def setUp(self):
+        self.messages = [EmailOutbox.objects.create(subject=f'Письмо {index}', body='Текст', to=['buyer@example.com'])
+                         for index in range(3)]
+
+    def test_sends_pending_messages(self):
+        dispatcher = OutboxDispatcher(batch_size=2)
+
+        self.assertEqual(dispatcher.dispatch(), 2)
+        self.assertEqual(dispatcher.dispatch(), 1)
+        self.assertEqual(dispatcher.dispatch(), 0)
+        self.assertEqual([message.subject for message in mail.outbox], ['Письмо 0', 'Письмо 1', 'Письмо 2'])
+        self.assertEqual(set(EmailOutbox.objects.values_list('status', 'attempts')), {('sent', 1)})
+
+    def test_claimed_messages_are_skipped(self):
+        claimed = OutboxDispatcher(batch_size=1).claim()
+
+        self.assertEqual(OutboxDispatcher().dispatch(), 2)
+        self.assertNotIn(claimed[0].subject, [message.subject for message in mail.outbox])
+
+    def test_failed_send_is_retried_later(self):
+        dispatcher = OutboxDispatcher(batch_size=1)
+        with patch.object(dispatcher.connection, 'send_messages', side_effect=OSError('connection refused')):
+            self.assertEqual(dispatcher.dispatch(), 0)
+
+        message = EmailOutbox.objects.get(id=self.messages[0].id)
+        self.assertEqual((message.status, message.attempts, message.last_error), ('pending', 1, 'connection refused'))
+        self.assertGreater(message.next_attempt_at, datetime.now(timezone.utc))
+
+
+class FeedStubHandler(BaseHTTPRequestHandler):
+    """
+    Прайс-лист магазина с ETag, отвечающий 503 первые failures запросов
+    """
+    etag = '"v1"'
+    failures = 0
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        if type(self).failures:
+            type(self).failures -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.etag and self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-yaml')
+        self.send_header('Content-Length', str(len(FEED_YAML)))
+        if self.etag:
+            self.send_header('ETag', self.etag)
+        self.end_headers()
+        self.wfile.write(FEED_YAML)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FeedImportTest(TestCase):
+    """
+    Импорт прайс-листа с локального HTTP-сервера: условные запросы, хэш содержимого и повторы
+    """
+
+    def setUp(self):
+        FeedStubHandler.etag = '"v1"'
+        FeedStubHandler.failures = 0
+        FeedStubHandler.requests = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FeedStubHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/shop1.yaml'
+        self.user = User.objects.create_user('shop@example.com', 'password', is_active=True, type='shop')
+
+    def test_second_import_with_same_etag_is_skipped(self):
+        first = import_shop_feed(self.user.id, self.url)
+        second = import_shop_feed(self.user.id, self.url)
+
+        self.assertEqual((first['rows'], first.get('skipped')), (1, None))
+        self.assertEqual(second['skipped'], 'not_modified')
+        self.assertEqual(FeedStubHandler.requests[1].get('If-None-Match'), '"v1"')
+        self.assertEqual(FeedCache.objects.get(user=self.user).etag, '"v1"')
+        self.assertEqual(ProductInfo.objects.filter(shop__user=self.user).count(), 1)
+
+    def test_second_import_with_same_content_is_skipped(self):
+        FeedStubHandler.etag = ''
+        import_shop_feed(self.user.id, self.url)
+        version = Shop.objects.get(user=self.user).catalog_version
+
+        self.assertEqual(import_shop_feed(self.user.id, self.url)['skipped'], 'unchanged')
+        self.assertEqual(Shop.objects.get(user=self.user).catalog_version, version)
+
+    def test_server_errors_are_retried(self):
+        FeedStubHandler.failures = 2
+
+        result = import_shop_feed(self.user.id, self.url)
+
+        self.assertEqual(result['rows'], 1)
+        self.assertEqual(len(FeedStubHandler.requests), 3)
+
+
+class ImportJobTest(TestCase):
+    """
+    Захват задач импорта по одной на магазин и итог задачи, снятой по таймауту
+    """
+
+    def setUp(self):
+        user = User.objects.create_user('shop@example.com', 'password', is_active=True, type='shop')
+        ImportJob.objects.create(user=user, url='https://shop.example/feed.yaml')
+        self.result = {'rows': 1, 'rows_per_sec': 10.0, 'errors': []}
+
+    def test_one_running_job_per_shop(self):
+        ImportJob.objects.create(user=User.objects.get(), url='https://shop.example/feed.yaml')
+        other = User.objects.create_user('other@example.com', 'password', is_active=True, type='shop')
+        other_job = ImportJob.objects.create(user=other, url='https://other.example/feed.yaml')
+
+        self.assertIsNotNone(claim_import_job('worker-1'))
+        self.assertEqual(claim_import_job('worker-2'), other_job)
+        self.assertIsNone(claim_import_job('worker-3'))
+
+    def test_finished_job_is_saved(self):
+        job = claim_import_job('worker-1')
+        with patch('api.jobs.import_shop_feed', return_value=self.result):
+            run_import_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_processed), ('done', 1))
+
+    def test_reaped_job_is_not_overwritten(self):
+        job = claim_import_job('worker-1')
+        with self.settings(IMPORT_JOB_TIMEOUT=-1):
+            self.assertIsNone(claim_import_job('worker-2'))
+        with patch('api.jobs.import_shop_feed', return_value=self.result):
+            self.assertEqual(run_import_job(job).status, 'failed')
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_processed), ('failed', 0))
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+_lock = threading.Lock()
+
+
+def take_token(key, capacity, per_minute):
+    """
+    Забирает жетон из корзины key (token bucket) в кэше LOGIN_THROTTLE['CACHE'].
+
+    Корзина вмещает capacity жетонов и пополняется на per_minute жетонов в минуту.
+    По умолчанию кэш локальный для процесса. Если он общий, время должно совпадать во всех процессах,
+    поэтому берется по часам, а не по time.monotonic(). Блокировка защищает корзину только внутри процесса:
+    при одновременных попытках из разных процессов лимит может быть превышен на несколько жетонов.
+
+    Returns:
+        float: 0, если жетон получен, иначе через сколько секунд появится следующий.
+    """
+    cache = caches[settings.LOGIN_THROTTLE['CACHE']]
+    rate = per_minute / 60
+    now = time.time()
+    with _lock:
+        tokens, updated = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + max(0, now - updated) * rate)
+        if tokens < 1:
+            cache.set(key, (tokens, now), timeout=int(capacity / rate) + 1)
+            return (1 - tokens) / rate
+        cache.set(key, (tokens - 1, now), timeout=int(capacity / rate) + 1)
+        return 0
+
+
+def client_ip(request):
+    """
+    IP клиента. За LOGIN_THROTTLE['TRUSTED_PROXIES'] доверенными прокси он берется из заголовка
+    LOGIN_THROTTLE['CLIENT_IP_HEADER'] (X-Forwarded-For): каждый прокси дописывает адрес своего
+    собеседника в конец, поэтому клиентом считается адрес, записанный самым дальним доверенным прокси.
+    Адреса левее него клиент мог подставить сам.
+    """
+    options = settings.LOGIN_THROTTLE
+    if options['TRUSTED_PROXIES']:
+        forwarded = [ip.strip() for ip in request.headers.get(options['CLIENT_IP_HEADER'], '').split(',') if ip.strip()]
+        if forwarded:
+            return forwarded[-min(options['TRUSTED_PROXIES'], len(forwarded))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def throttle_login(request, email):
+    """
+    Ограничивает попытки входа по IP клиента и по email до проверки пароля,
+    поэтому отклоненные попытки не тратят время процессора на хэширование.
+    Корзина email общая для всех адресов и ограничивает перебор пароля одной учетной записи с разных IP.
+
+    Returns:
+        float: 0, если попытку можно выполнять, иначе через сколько секунд повторить.
+    """
+    options = settings.LOGIN_THROTTLE
+    return take_token(f'login-ip:{client_ip(request)}', options['IP_BURST'], options['IP_PER_MINUTE']) or \
+        take_token(f'login-email:{email.strip().lower()}', options['EMAIL_BURST'], options['EMAIL_PER_MINUTE'])
+
+
+def throttle_register(request):
+    """
+    Ограничивает регистрации с одного IP: проверка и хэширование пароля так же дороги, как вход
+    """
+    options = settings.LOGIN_THROTTLE
+    return take_token(f'register-ip:{client_ip(request)}', options['IP_BURST'], options['IP_PER_MINUTE'])
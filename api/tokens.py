@@ -0,0 +1,110 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+from django.conf import settings
+
+HEADER = {'alg': 'HS256', 'typ': 'JWT'}
+
+
+class TokenError(ValueError):
+    """
+    Токен поврежден, подписан другим ключом, просрочен или другого типа
+    """
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _dumps(data):
+    return _b64encode(json.dumps(data, separators=(',', ':'), sort_keys=True).encode())
+
+
+def _sign(message):
+    return _b64encode(hmac.new(settings.SIGNED_TOKENS['SIGNING_KEY'].encode(), message.encode(),
+                               hashlib.sha256).digest())
+
+
+def encode(payload):
+    """
+    Подписывает payload в формате JWT (HS256)
+    """
+    message = f'{_dumps(HEADER)}.{_dumps(payload)}'
+    return f'{message}.{_sign(message)}'
+
+
+def decode(token, token_type):
+    """
+    Проверяет подпись, срок действия и тип токена без обращения к базе.
+
+    Returns:
+        dict: Данные токена.
+
+    Raises:
+        TokenError: Токен недействителен.
+    """
+    try:
+        header, payload, signature = token.split('.')
+    except (AttributeError, ValueError):
+        raise TokenError('Неверный формат токена')
+    if not hmac.compare_digest(signature.encode(), _sign(f'{header}.{payload}').encode()):
+        raise TokenError('Неверная подпись токена')
+    try:
+        if json.loads(_b64decode(header)) != HEADER:
+            raise TokenError('Неподдерживаемый алгоритм токена')
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        raise TokenError('Неверный формат токена')
+    if claims.get('token_type') != token_type:
+        raise TokenError('Неверный тип токена')
+    if claims.get('exp', 0) < time.time():
+        raise TokenError('Срок действия токена истек')
+    return claims
+
+
+def password_fingerprint(user):
+    """
+    Отпечаток хэша пароля: refresh-токены, выданные до смены пароля, перестают приниматься
+    """
+    return _sign(user.password)[:16]
+
+
+def access_token(user):
+    """
+    Короткоживущий токен доступа. Содержит все, что нужно представлениям, чтобы не читать пользователя из базы
+    """
+    now = int(time.time())
+    return encode({
+        'token_type': 'access',
+        'sub': user.pk,
+        'email': user.email,
+        'type': user.type,
+        'staff': user.is_staff,
+        'iat': now,
+        'exp': now + settings.SIGNED_TOKENS['ACCESS_LIFETIME'],
+    })
+
+
+def refresh_token(user):
+    """
+    Долгоживущий токен для получения новой пары токенов через api/v1/user/token/refresh/
+    """
+    now = int(time.time())
+    return encode({
+        'token_type': 'refresh',
+        'sub': user.pk,
+        'pwd': password_fingerprint(user),
+        'iat': now,
+        'exp': now + settings.SIGNED_TOKENS['REFRESH_LIFETIME'],
+    })
+
+
+def token_pair(user):
+    return {'Access': access_token(user), 'Refresh': refresh_token(user)}
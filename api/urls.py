@@ -1,5 +1,6 @@
-from api.views import ShopView, ContactView, CategoryView, LoginAccountView, ProductInfoView, \
-    BasketView, OrderView, PartherOrders, ConfirmAccountView, RegisterAccountView, PartherState, PartherUpdate
+from api.views import ShopView, ContactView, CategoryView, LoginAccountView, LogoutAccountView, RefreshTokenView, \
+    ProductInfoView, ProductSearchView, BasketView, OrderView, PartherOrders, ConfirmAccountView, RegisterAccountView, \
+    PartherState, PartherUpdate, PartherImportStatus, PartherExport
 from django.urls import path
 
 urlpatterns = [
@@ -8,11 +9,16 @@ urlpatterns = [
     path('api/v1/user/shops/', ShopView.as_view(), name='shops'),
     path('api/v1/user/contact/', ContactView.as_view(), name='contact'),
     path('api/v1/user/login/', LoginAccountView.as_view(), name='login'),
+    path('api/v1/user/token/refresh/', RefreshTokenView.as_view(), name='token-refresh'),
+    path('api/v1/user/logout/', LogoutAccountView.as_view(), name='logout'),
     path('api/v1/user/categories/', CategoryView.as_view(), name='category'),
     path('api/v1/user/product/', ProductInfoView.as_view(), name='product_to_info'),
+    path('api/v1/user/product/search/', ProductSearchView.as_view(), name='product-search'),
     path('api/v1/user/basket/', BasketView.as_view(), name='basket'),
     path('api/v1/user/orders/', OrderView.as_view(), name='orders'),
     path('api/v1/shop/orders/', PartherOrders.as_view(), name='shop-orders'),
     path('api/v1/shop/state/', PartherState.as_view(), name='shop-state'),
-    path('api/v1/shop/goods/', PartherUpdate.as_view(), name='shop-goods')
+    path('api/v1/shop/goods/', PartherUpdate.as_view(), name='shop-goods'),
+    path('api/v1/shop/goods/<int:job_id>/', PartherImportStatus.as_view(), name='shop-goods-status'),
+    path('api/v1/shop/export/', PartherExport.as_view(), name='shop-export'),
 ]
\ No newline at end of file
@@ -1,11 +1,18 @@
-from api.models import Order, User, ConfirmEmailToken
+from api.authentication import invalidate_token, invalidate_user_tokens
+from api.models import User, ConfirmEmailToken, EmailOutbox
 from api_test import settings
 
+from datetime import datetime, time
+from itertools import islice
 from typing import Type
 
-from django.core.mail import send_mail, EmailMultiAlternatives
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.authtoken.models import Token
+
 
 @receiver(post_save, sender=User)
 def new_user_registered_signal(sender: Type[User], instance: User, created: bool, **kwargs):
@@ -16,17 +23,64 @@ def new_user_registered_signal(sender: Type[User], instance: User, created: bool
         # send an e-mail to the user
         token, _ = ConfirmEmailToken.objects.get_or_create(user_id=instance.pk)
 
-        msg = EmailMultiAlternatives(
-            # title:
-            f"Password Reset Token for {instance.email}",
-            # message:
-            token.key,
-            # from:
-            settings.EMAIL_HOST_USER,
-            # to:
-            [instance.email]
-        )
-        msg.send()
+        queue_email(f"Password Reset Token for {instance.email}", token.key, [instance.email])
+
+
+@receiver(post_save, sender=User)
+def user_changed_signal(sender: Type[User], instance: User, created: bool, **kwargs):
+    """
+    Сбрасываем кэш аутентификации пользователя после смены пароля, деактивации и других изменений
+    """
+    if not created:
+        transaction.on_commit(lambda: invalidate_user_tokens(instance.pk))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted_signal(sender: Type[Token], instance: Token, **kwargs):
+    """
+    Сбрасываем кэш аутентификации удаленного токена (выход пользователя)
+    """
+    transaction.on_commit(lambda: invalidate_token(instance.key))
+
+
+def queue_email(subject, message, recipient_list):
+    """
+    Ставит письмо в очередь EmailOutbox в текущей транзакции, отправку выполняет run_email_dispatcher
+    """
+    return EmailOutbox.objects.create(subject=subject, body=message, from_email=settings.EMAIL_HOST_USER or '',
+                                      to=recipient_list)
+
+
+def chunked(iterable, size):
+    """
+    Разбивает итерируемый объект на списки длиной не больше size
+    """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def parse_moment(value, end_of_day=False):
+    """
+    Разбирает дату или дату со временем в формате ISO 8601 в aware datetime.
+    Дата без времени означает начало дня, а с end_of_day - его последнюю микросекунду,
+    чтобы верхняя граница диапазона включала весь день. Время без смещения считается в TIME_ZONE.
+
+    Raises:
+        ValueError: Значение не является датой.
+    """
+    # Дата проверяется первой: parse_datetime принимает и дату без времени, считая ее началом дня
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day, time.max if end_of_day else time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(value)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
 
 def send_order_status_email(user_id, status=None):
     user = User.objects.get(id=user_id)
@@ -34,8 +88,5 @@ def send_order_status_email(user_id, status=None):
     status = 'СФОРМИРОВАН' if status is True else 'ОТМЕНЕН'
     subject = f'Обновление статуса'
     message = f'Статус вашего заказа изменен на ЗАКАЗ {status}'
-    sender_email = settings.EMAIL_HOST_USER
     recipient_list = [user_email]
-    send_mail(subject, message, sender_email, recipient_list)
-
-
+    queue_email(subject, message, recipient_list)
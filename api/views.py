@@ -1,28 +1,54 @@
+import hmac
 import json
-import requests as web_request
+import math
+from datetime import timedelta
 from django.contrib.auth.password_validation import validate_password
-from yaml import load as load_yaml, Loader
 
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.core.validators import URLValidator
-from django.db.models import Sum, F
-from django.http import JsonResponse
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
 from rest_framework.generics import ListAPIView, get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.authtoken.models import Token
 
-from api.models import Shop, Category, Contact, Product, ProductInfo, Order, OrderItem, Parameter, ProductParameter, \
-    STATUS_SHOP, ConfirmEmailToken
-from api.serializers import ShopSerializer, CategorySerializer, ContactSerializer, \
-    ProductInfoSerializer, OrderSerializer, OrderItemSerializer, UserSerializer
-from api.utils import send_order_status_email
+from api.basket import BasketError, add_items, delete_items, parse_basket_items, update_items
+from api.cache import CatalogCacheMixin, orders_etag
+from api.db import ReplicaReadMixin
+from api.export import EXPORT_FORMATS, export_catalog
+from api.fast_serializers import ORDER_VALUES, PRODUCT_INFO_VALUES, order_data, product_info_data, \
+    shop_order_data
+from api.idempotency import idempotent
+from api.jobs import get_job_progress
+from api.models import Shop, Category, Contact, ProductInfo, Order, OrderItem, STATUS_SHOP, ConfirmEmailToken, \
+    ImportJob, User
+from api.pagination import KeysetPagination
+from api.renderers import JsonResponse
+from api.search import get_search_backend
+from api.serializers import ShopSerializer, CategorySerializer, ContactSerializer, UserSerializer, \
+    ImportJobSerializer
+from api.stock import StockError, release_stock, reserve_stock, stock_shortages
+from api.throttling import throttle_login, throttle_register
+from api.tokens import TokenError, decode, password_fingerprint, token_pair
+from api.utils import parse_moment, send_order_status_email
 
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 
 
 
+def throttled_response(retry_after):
+    response = JsonResponse({'Status': False, 'Errors': 'Слишком много попыток, повторите позже'}, status=429)
+    response['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+
 class RegisterAccountView(APIView):
     """
     Класс для регистрации покупателей
@@ -47,6 +73,9 @@ class RegisterAccountView(APIView):
                 JsonResponse: The response indicating the status of the operation and any errors.
             """
         if {'first_name', 'last_name', 'email', 'password'}.issubset(request.data):
+            retry_after = throttle_register(request)
+            if retry_after:
+                return throttled_response(retry_after)
 
             try:
                 validate_password(request.data['password'])
@@ -60,9 +89,10 @@ class RegisterAccountView(APIView):
 
                 user_serializer = UserSerializer(data=request.data)
                 if user_serializer.is_valid():
-                    user = user_serializer.save()
-                    user.set_password(request.data['password'])
-                    user.save()
+                    with transaction.atomic():
+                        user = user_serializer.save()
+                        user.set_password(request.data['password'])
+                        user.save()
                     return JsonResponse({'Status': True})
                 else:
                     return JsonResponse({'Status': False, 'Errors': user_serializer.errors})
@@ -118,20 +148,61 @@ class LoginAccountView(APIView):
             JsonResponse: The response indicating the status of the operation and any errors.
         """
         if {'email', 'password'}.issubset(request.data):
+            retry_after = throttle_login(request, str(request.data['email']))
+            if retry_after:
+                return throttled_response(retry_after)
 
             user = authenticate(request, username=request.data['email'], password=request.data['password'])
 
             if user is not None:
                 if user.is_active:
                     token, _ = Token.objects.get_or_create(user=user)
-                    return JsonResponse({'Status': True, 'Token': token.key})
+                    return JsonResponse({'Status': True, 'Token': token.key, **token_pair(user)})
 
             return JsonResponse({'Status': False, 'Errors': 'Не удалось авторизовать'})
 
         return JsonResponse({'Status': False, 'Errors': 'Не указаны все необходимые аргументы'})
 
 
-class CategoryView(ListAPIView):
+class RefreshTokenView(APIView):
+    """
+    Класс для обновления подписанных токенов
+    """
+    authentication_classes = []
+
+    def post(self, request, *args, **kwargs):
+        """
+        Выдает новую пару токенов доступа и обновления по refresh-токену.
+        Refresh-токен не принимается, если пользователь деактивирован или сменил пароль.
+        """
+        try:
+            claims = decode(request.data.get('refresh'), 'refresh')
+        except TokenError as error:
+            return JsonResponse({'Status': False, 'Errors': str(error)}, status=401)
+
+        user = User.objects.filter(id=claims['sub'], is_active=True).first()
+        if user is None or not hmac.compare_digest(claims['pwd'].encode(), password_fingerprint(user).encode()):
+            return JsonResponse({'Status': False, 'Errors': 'Токен отозван'}, status=401)
+        return JsonResponse({'Status': True, **token_pair(user)})
+
+
+class LogoutAccountView(APIView):
+    """
+    Класс для выхода пользователя
+    """
+
+    def post(self, request, *args, **kwargs):
+        """
+        Удаляет токен пользователя, кэш аутентификации по нему сбрасывается сигналом
+        """
+        if not request.user.is_authenticated:
+            return JsonResponse({'Status': 'False', 'Error': 'Not Log in'}, status=403)
+
+        Token.objects.filter(user_id=request.user.id).delete()
+        return JsonResponse({'Status': True})
+
+
+class CategoryView(CatalogCacheMixin, ListAPIView):
     """
        Класс для просмотра категорий
     """
@@ -139,7 +210,7 @@ class CategoryView(ListAPIView):
     serializer_class = CategorySerializer
 
 
-class ShopView(ListAPIView):
+class ShopView(CatalogCacheMixin, ListAPIView):
     """
     Класс для просмотра списка магазинов
     """
@@ -147,7 +218,7 @@ class ShopView(ListAPIView):
     serializer_class = ShopSerializer
 
 
-class ProductInfoView(APIView):
+class ProductInfoView(CatalogCacheMixin, APIView):
     """
         Класс для просмотра продуктов.
 
@@ -157,22 +228,84 @@ class ProductInfoView(APIView):
         Attributes:
         - None
     """
+    cache_shop_param = 'shop'
+    filter_lookups = {
+        'shop': 'shop_id',
+        'product': 'product_id',
+        'category': 'product__category_id',
+        'price_min': 'price__gte',
+        'price_max': 'price__lte',
+    }
+
     def get(self, request, *args, **kwargs):
+        """
+        Список продуктов с фильтрами из строки запроса и пагинацией по курсору.
+
+        Query params:
+            shop, product, category: id магазина, продукта, категории.
+            price_min, price_max: Диапазон цены.
+            in_stock: Только товары в наличии.
+            parameter: Значение параметра в виде "название:значение", можно указать несколько раз.
+            cursor: Курсор следующей страницы.
+
+        Returns:
+            JsonResponse: Ссылка на следующую страницу и список продуктов.
+        """
         queryset = ProductInfo.objects.filter(shop__status=True)
 
-        shop_id = request.data.get('shop')
-        product_id = request.data.get('product')
+        try:
+            for param, lookup in self.filter_lookups.items():
+                value = request.query_params.get(param)
+                if value:
+                    queryset = queryset.filter(**{lookup: int(value)})
+        except ValueError:
+            return JsonResponse({'Status': False, 'Errors': f'Неверное значение {param}'}, status=400)
 
-        if shop_id:
-            queryset = queryset.filter(shop_id=shop_id)
-        if product_id:
-            queryset = queryset.filter(product_id=product_id)
+        if request.query_params.get('in_stock') in ('1', 'true', 'True'):
+            queryset = queryset.filter(quantity__gt=0)
 
-        queryset = queryset.select_related(
-            'shop', 'product__category').prefetch_related(
-            'product_details__parameter').distinct()
-        serializer = ProductInfoSerializer(queryset, many=True)
-        return JsonResponse(serializer.data, safe=False)
+        for parameter in request.query_params.getlist('parameter'):
+            name, separator, value = parameter.partition(':')
+            if not separator:
+                return JsonResponse({'Status': False, 'Errors': 'parameter указывается как название:значение'},
+                                    status=400)
+            queryset = queryset.filter(product_details__parameter__name=name, product_details__value=value)
+
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(queryset.values(*PRODUCT_INFO_VALUES), request)
+        return JsonResponse({'next': paginator.get_next_link(), 'results': product_info_data(page)})
+
+
+class ProductSearchView(APIView):
+    """
+    Класс для полнотекстового поиска продуктов
+
+    Methods:
+        - get: Найти продукты по названию, модели, категории и параметрам
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        Поиск продуктов по строке q с поиском по началу слов.
+
+        Query params:
+            q: Строка поиска.
+            limit: Количество результатов, не больше SEARCH_MAX_LIMIT.
+
+        Returns:
+            JsonResponse: Продукты, отсортированные по релевантности.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return JsonResponse({'Status': False, 'Errors': 'Не указана строка поиска'}, status=400)
+        try:
+            limit = min(int(request.query_params.get('limit', api_settings.PAGE_SIZE)), settings.SEARCH_MAX_LIMIT)
+        except ValueError:
+            return JsonResponse({'Status': False, 'Errors': 'Неверное значение limit'}, status=400)
+
+        ids = get_search_backend().search(query, limit)
+        rows = {row['id']: row for row in ProductInfo.objects.filter(id__in=ids).values(*PRODUCT_INFO_VALUES)}
+        return JsonResponse({'results': product_info_data(rows[id_] for id_ in ids if id_ in rows)})
 
 
 class BasketView(APIView):
@@ -202,14 +335,8 @@ class BasketView(APIView):
         if not request.user.is_authenticated:
             return JsonResponse({'Status': 'False', 'Error': 'Not Log in'}, status=403)
 
-        basket = Order.objects.filter(
-            user_id=request.user.id, status='basket').prefetch_related(
-            'orderitem_order__product__products_info').annotate(
-            total_sum=Sum(F('orderitem_order__quantity') * F('orderitem_order__product__products_info__price'))
-        )
-
-        seriralizer = OrderSerializer(basket, many=True)
-        return JsonResponse(seriralizer.data, safe=False)
+        basket = Order.objects.filter(user_id=request.user.id, status='basket')
+        return JsonResponse(order_data(basket.values(*ORDER_VALUES)), safe=False)
 
     def post(self, request, *args, **kwargs):
         """
@@ -233,21 +360,17 @@ class BasketView(APIView):
         if not items_json:
             return JsonResponse({'status': False, 'error': 'No item data provided'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            basket, _ = Order.objects.get_or_create(user=request.user, status='basket')
+            items = parse_basket_items(items_json)
+            with transaction.atomic():
+                basket, _ = Order.objects.get_or_create(user=request.user, status='basket')
+                objects_created = add_items(basket, items)
+        except BasketError as error:
+            return JsonResponse({'status': False, 'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
         except Order.MultipleObjectsReturned:
             return JsonResponse({'status': False, "error": 'Basket already exists'})
         except IntegrityError as error:
             return JsonResponse({'status': False, 'error': str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        objects_created = 0
-        for item_data in items_json:
-            item_data['order'] = basket.id
-            serializer = OrderItemSerializer(data=item_data)
-            if serializer.is_valid():
-                serializer.save()
-                objects_created += 1
-            else:
-                return JsonResponse({'status': False, 'error': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
         return JsonResponse({'status': True, 'objects_created': objects_created}, status=status.HTTP_201_CREATED)
 
     def put(self, request, *args, **kwargs):
@@ -268,18 +391,15 @@ class BasketView(APIView):
             return JsonResponse({'status': False, 'error': 'No item data provided'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            basket, _ = Order.objects.get_or_create(user=request.user, status='basket')
+            items = parse_basket_items(items_json)
+            with transaction.atomic():
+                basket, _ = Order.objects.get_or_create(user=request.user, status='basket')
+                objects_update = update_items(basket, items)
+        except BasketError as error:
+            return JsonResponse({'status': False, 'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
         except IntegrityError as error:
             return JsonResponse({'status': False, 'error': str(error)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        objects_update = 0
-        for item_data in items_json:
-            item_data['order_id'] = basket.id
-            serializer = OrderItemSerializer(data=item_data)
-            objects_update += OrderItem.objects.filter(
-                order_id=basket.id, shop_id=item_data['shop'], product_id=item_data['product']).update(
-                quantity=item_data['quantity'])
-
         return JsonResponse({'Status': True, 'Обновлено объектов': objects_update})
 
     def delete(self, request, *args, **kwargs):
@@ -300,14 +420,14 @@ class BasketView(APIView):
         if not items_json:
             return JsonResponse({'status': False, 'error': 'No item data provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-        basket, _ = Order.objects.get_or_create(user_id=request.user.id, status='basket')
+        try:
+            items = parse_basket_items(items_json, with_quantity=False)
+        except BasketError as error:
+            return JsonResponse({'status': False, 'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
 
-        objects_deleted = 0
-        for item_data in items_json:
-            item_data['order_id'] = basket.id
-            serializer = OrderItemSerializer(data=item_data)
-            objects_deleted += OrderItem.objects.filter(
-                order_id=basket.id, shop_id=item_data['shop'], product_id=item_data['product']).delete()[0]
+        with transaction.atomic():
+            basket, _ = Order.objects.get_or_create(user_id=request.user.id, status='basket')
+            objects_deleted = delete_items(basket, items)
 
         return JsonResponse({'Status': True, 'Удалено объектов': objects_deleted})
 
@@ -418,7 +538,7 @@ class PartherUpdate(APIView):
     Класс для добавления товара в магазин
 
     Methods:
-    - post: Обновление информации о партнере.
+    - post: Постановка прайс-листа партнера в очередь импорта.
 
     Attributes:
     - None
@@ -439,37 +559,73 @@ class PartherUpdate(APIView):
             except ValidationError as e:
                 return JsonResponse({'Status': False, 'Error': str(e)})
 
-            content = web_request.get(url).content
-            data = load_yaml(content, Loader=Loader)
-
-            shop, _ = Shop.objects.get_or_create(name=data['name'], user_id=request.user.id)
-
-            for category in data['categories']:
-                categories, _ = Category.objects.get_or_create(name=category['name'], category_id=category['id'])
-                categories.shops.add(shop.id)
-                categories.save()
-            ProductInfo.objects.filter(shop_id=shop.id).delete()
-
-            for item in data['goods']:
-                product, _ = Product.objects.get_or_create(name=item['name'], category_id=item['category'])
-                product_info = ProductInfo.objects.create(product_id=product.id,
-                                                          model=item['model'],
-                                                          name=item['name'],
-                                                          price=item['price'],
-                                                          price_rrc=item['price_rrc'],
-                                                          quantity=item['quantity'],
-                                                          shop_id=shop.id)
-                product.save()
-                for name, value in item['parameters'].items():
-                    parameter, _ = Parameter.objects.get_or_create(name=name)
-                    ProductParameter.objects.create(parameter=product_info.id,
-                                                    quantity=product_info.quantity,
-                                                    value=value)
-                    parameter.save()
-            return JsonResponse({'Status': True})
+            job = ImportJob.objects.create(user_id=request.user.id, url=url)
+            return JsonResponse({'Status': True, 'Job': job.id}, status=status.HTTP_202_ACCEPTED)
         return JsonResponse({'Status': False, 'Errors': 'Не указаны все необходимые аргументы'})
 
 
+class PartherImportStatus(APIView):
+    """
+    Класс для просмотра статуса импорта прайс-листа
+
+    Methods:
+        - get: Просмотр прогресса задачи импорта
+    """
+
+    def get(self, request, job_id, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'Status': 'False', 'Error': 'Not Log in'}, status=403)
+
+        if request.user.type != 'shop':
+            return JsonResponse({'Status': 'False', 'Error': 'Только для магазинов'})
+
+        job = get_object_or_404(ImportJob, id=job_id, user_id=request.user.id)
+        data = ImportJobSerializer(job).data
+        if job.status == 'running':
+            data.update(get_job_progress(job.id))
+        return JsonResponse(data)
+
+
+class PartherExport(APIView):
+    """
+    Класс для выгрузки каталога
+
+    Methods:
+        - get: Потоковая выгрузка товаров магазина в NDJSON или CSV
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        Параметры запроса:
+            output: ndjson (по умолчанию) или csv.
+            shop: id магазина, только для персонала. Без него персонал получает весь каталог.
+        Магазин всегда получает только свои товары.
+        """
+        if not request.user.is_authenticated:
+            return JsonResponse({'Status': 'False', 'Error': 'Not Log in'}, status=403)
+
+        if request.user.is_staff:
+            shop_id = request.query_params.get('shop')
+            if shop_id is not None and not shop_id.isdigit():
+                return JsonResponse({'Status': False, 'Errors': 'Неверное значение shop'}, status=400)
+        elif request.user.type == 'shop':
+            shop_id = Shop.objects.filter(user_id=request.user.id).values_list('id', flat=True).first()
+            if shop_id is None:
+                return JsonResponse({'Status': False, 'Errors': 'Магазин не найден'}, status=404)
+        else:
+            return JsonResponse({'Status': 'False', 'Error': 'Только для магазинов'}, status=403)
+
+        export_format = request.query_params.get('output', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return JsonResponse({'Status': False, 'Errors': 'Неверное значение output'}, status=400)
+
+        _, content_type = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(export_catalog(export_format, shop_id and int(shop_id)),
+                                         content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="catalog.{export_format}"'
+        return response
+
+
 class PartherState(APIView):
     """
     Класс для изменения статуса партнера
@@ -504,7 +660,8 @@ class PartherState(APIView):
         state = request.data.get('state')
         if state in STATUS_SHOP:
             try:
-                Shop.objects.filter(user_id=request.user.id).update(status=state)
+                Shop.objects.filter(user_id=request.user.id).update(
+                    status=state, catalog_version=F('catalog_version') + 1)
                 return JsonResponse({'Status': True})
             except ValueError:
                 return JsonResponse({'Status': False, 'error': ValueError})
@@ -512,7 +669,7 @@ class PartherState(APIView):
         return JsonResponse({'Status': False, 'Errors': 'Не указаны все необходимые аргументы'})
 
 
-class PartherOrders(APIView):
+class PartherOrders(ReplicaReadMixin, APIView):
     """
     Класс для просмотра заказов магазина
 
@@ -520,21 +677,60 @@ class PartherOrders(APIView):
         - get: Просмотреть заказы
     """
     def get(self, request, *args, **kwargs):
+        """
+        Заказы с товарами магазина, от новых к старым, с пагинацией по курсору (dt, id).
+
+        Query params:
+            status: Статус заказа.
+            date_from, date_to: Границы даты заказа в формате ISO 8601, дата без времени включает весь день.
+            cursor: Курсор следующей страницы.
+            since: Курсор последнего полученного заказа. В этом режиме заказы идут по времени последнего
+                изменения статуса (updated_at, id) от старых к новым, поэтому заказ из корзины, созданной
+                до курсора, приходит после оформления. Заказы, измененные за последние
+                SHOP_ORDERS_POLL_DELAY секунд, не отдаются, пока не завершатся параллельные транзакции
+                с более ранним updated_at. В ответе возвращается cursor для следующего опроса.
+                Пустое значение - с самого начала.
+
+        Returns:
+            JsonResponse: Заказы с позициями магазина.
+        """
         if not request.user.is_authenticated:
             return JsonResponse({'Status': 'False', 'Error': 'Not Log in'}, status=403)
 
         if request.user.type != 'shop':
             return JsonResponse({'Status': 'False', 'Error': 'Только для магазинов'})
 
-        order = Order.objects.filter(orderitem_order__shop__user=request.user.id).exclude(
-            status='basket').annotate(
-            total_sum=Sum(F('orderitem_order__quantity') * F('orderitem_order__product__products_info__price'))
-        )
-        serializer = OrderSerializer(order, many=True)
-        return JsonResponse(serializer.data, safe=False)
-
-
-class OrderView(APIView):
+        shop_id = Shop.objects.filter(user_id=request.user.id).values_list('id', flat=True).first()
+        orders = Order.objects.filter(
+            id__in=OrderItem.objects.filter(shop_id=shop_id).values('order_id')).exclude(
+            status='basket').values(*ORDER_VALUES)
+
+        order_status = request.query_params.get('status')
+        if order_status:
+            orders = orders.filter(status=order_status)
+        for param, lookup in (('date_from', 'dt__gte'), ('date_to', 'dt__lte')):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    orders = orders.filter(**{lookup: parse_moment(value, end_of_day=param == 'date_to')})
+                except ValueError:
+                    return JsonResponse({'Status': False, 'Errors': f'Неверное значение {param}'}, status=400)
+
+        if 'since' in request.query_params:
+            orders = orders.filter(
+                updated_at__lt=timezone.now() - timedelta(seconds=settings.SHOP_ORDERS_POLL_DELAY))
+            paginator = KeysetPagination(ordering=('updated_at', 'id'), cursor_query_param='since')
+            page = paginator.paginate_queryset(orders, request)
+            return JsonResponse({'next': paginator.get_next_link(), 'cursor': paginator.get_last_cursor(),
+                                 'results': shop_order_data(page, shop_id)})
+
+        paginator = KeysetPagination(ordering=('-dt', '-id'))
+        page = paginator.paginate_queryset(orders, request)
+        return JsonResponse({'next': paginator.get_next_link(), 'results': shop_order_data(page, shop_id)})
+
+
+@method_decorator(condition(etag_func=orders_etag), name='get')
+class OrderView(ReplicaReadMixin, APIView):
     """
     Класс для заполнение и изменения заказа
 
@@ -550,51 +746,63 @@ class OrderView(APIView):
         if not request.user.is_authenticated:
             return JsonResponse({'Status': 'False', 'Error': 'Not Log in'}, status=403)
 
-        orders = Order.objects.filter(user=request.user.id).exclude(status='basket').annotate(
-            total_sum=Sum(F('orderitem_order__quantity') * F('orderitem_order__product__products_info__price')))
-
-        serializer = OrderSerializer(orders, many=True)
-        return JsonResponse(serializer.data, safe=False)
+        orders = Order.objects.filter(user=request.user.id).exclude(status='basket')
+        return JsonResponse(order_data(orders.values(*ORDER_VALUES)), safe=False)
 
+    @idempotent
     def post(self, request, *args, **kwargs):
+        """
+        Оформление заказа из корзины одним условным UPDATE ... WHERE status='basket',
+        поэтому из параллельных запросов заказ оформит только один.
+        Товары заказа резервируются на складе, при нехватке заказ остается в корзине.
+        Поддерживает заголовок Idempotency-Key.
+        """
         if not request.user.is_authenticated:
             return JsonResponse({'Status': 'False', 'Error': 'Not Log in'}, status=403)
 
-        order_id = int(request.data.get('order'))
-        contact = int(request.data.get('contact'))
-
         try:
-            orders = Order.objects.filter(id=order_id)
-        except ValueError:
+            order_id = int(request.data.get('order'))
+            contact = int(request.data.get('contact'))
+        except (TypeError, ValueError):
             return JsonResponse({'Status': False, 'Description': 'Не верно передан Формат'})
 
-        for order in orders:
-            if order.status == 'order':
-                return JsonResponse({'Status': False, 'Description': 'Заказ уже оформлен'})
-            else:
-                orders.update(status='order', contact_id=contact)
-                send_order_status_email(user_id=order.user_id, status=True)  # Отправка СМС пользователю о формировании заказа
-                return JsonResponse({'Status': True, 'Description': 'Заказ оформлен'})
+        orders = Order.objects.filter(id=order_id, user_id=request.user.id)
+        try:
+            with transaction.atomic():
+                if orders.filter(status='basket').update(status='order', contact_id=contact,
+                                                         updated_at=timezone.now()):
+                    reserve_stock(order_id)
+                    send_order_status_email(user_id=request.user.id, status=True)  # Отправка СМС пользователю о формировании заказа
+                    return JsonResponse({'Status': True, 'Description': 'Заказ оформлен'})
+        except StockError as error:
+            return JsonResponse({'Status': False, 'Errors': str(error), 'Shortages': stock_shortages(order_id)},
+                                status=409)
+
+        if orders.exists():
+            return JsonResponse({'Status': False, 'Description': 'Заказ уже оформлен'})
         return JsonResponse({'Status': False, 'Description': 'Не верно передан заказ'})
 
-
+    @idempotent
     def put(self, request, *args, **kwargs):
+        """
+        Отмена заказа одним условным UPDATE ... WHERE status='order', товары возвращаются на склад.
+        Поддерживает заголовок Idempotency-Key.
+        """
         if not request.user.is_authenticated:
             return JsonResponse({'Status': 'False', 'Error': 'Not Log in'}, status=403)
 
-        order_id = request.data.get('order')
-
         try:
-            orders = Order.objects.filter(id=order_id)
-        except ValueError:
+            order_id = int(request.data.get('order'))
+        except (TypeError, ValueError):
             return JsonResponse({'Status': False, 'Description': 'Не верно передан Формат'})
 
-        for order in orders:
-            if order.status == 'order':
-                orders.update(status='basket')
-                send_order_status_email(user_id=order.user_id)
-
+        orders = Order.objects.filter(id=order_id, user_id=request.user.id)
+        with transaction.atomic():
+            if orders.filter(status='order').update(status='basket', updated_at=timezone.now()):
+                release_stock(order_id)
+                send_order_status_email(user_id=request.user.id)
                 return JsonResponse({'Status': True, 'Description': 'Заказ отменен'})
-            else:
-                return JsonResponse({'Status': False, 'Description': 'Уже в корзине'})
+
+        if orders.exists():
+            return JsonResponse({'Status': False, 'Description': 'Уже в корзине'})
         return JsonResponse({'Status': False, 'Description': 'Не верно передан заказ'})
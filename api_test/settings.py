@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -56,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.db.ReplicaPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'api_test.urls'
@@ -82,17 +84,87 @@ WSGI_APPLICATION = 'api_test.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=postgresql для рабочего окружения, по умолчанию SQLite для локального запуска и тестов
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'api_test'),
+            'USER': os.getenv('DB_USER', 'postgres'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            # Постоянные соединения: соединение переиспользуется запросами потока до CONN_MAX_AGE секунд
+            # и проверяется перед повторным использованием
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            # QuerySet.iterator() читает строки серверным курсором. За PgBouncer в режиме пула транзакций
+            # серверные курсоры нужно отключить: DB_DISABLE_SERVER_SIDE_CURSORS=1
+            'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS', '0') == '1',
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'timeout': float(os.getenv('DB_BUSY_TIMEOUT', 20)),
+            },
+            # Тестовая база в файле, а не в памяти: тесты параллельных запросов открывают соединения из потоков
+            'TEST': {
+                'NAME': os.getenv('DB_TEST_NAME', BASE_DIR / 'test_db.sqlite3'),
+            },
+        }
     }
+
+# Реплики только для чтения через запятую: пути к файлам для SQLite, HOST[:PORT][/NAME] для PostgreSQL.
+# Для локальной проверки с SQLite реплика - копия основного файла базы
+DB_REPLICAS = [replica for replica in os.getenv('DB_REPLICAS', '').split(',') if replica]
+for index, replica in enumerate(DB_REPLICAS):
+    if DB_ENGINE == 'postgresql':
+        address, _, name = replica.partition('/')
+        host, _, port = address.partition(':')
+        location = {'HOST': host or DATABASES['default']['HOST'], 'PORT': port or DATABASES['default']['PORT'],
+                    'NAME': name or DATABASES['default']['NAME']}
+    else:
+        location = {'NAME': replica}
+    DATABASES[f'replica_{index}'] = {**DATABASES['default'], **location, 'TEST': {'MIRROR': 'default'}}
+
+# Чтение безопасных запросов представлений каталога и истории заказов с реплик (api.db.ReplicaRouter),
+# пользователь после записи читает из основной базы REPLICA_PIN_SECONDS секунд
+DATABASE_ROUTERS = ['api.db.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+REPLICA_PIN_CACHE = 'replica_pin'
+
+# PRAGMA для каждого нового соединения SQLite (api.db.configure_sqlite)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'busy_timeout': int(float(os.getenv('DB_BUSY_TIMEOUT', 20)) * 1000),
 }
 
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
+# Хэширование паролей. Число итераций PBKDF2 задается для окружения, хэши с другим числом итераций
+# пересчитываются при входе пользователя
+PASSWORD_HASHERS = [
+    'api.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', 720000))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -138,11 +210,150 @@ EMAIL_PORT = os.getenv('EMAIL_PORT')  # Порт для SMTP-сервера mail
 EMAIL_USE_TLS = True  # Использовать TLS-шифрование
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')  # Ваш адрес электронной почты mail.ru
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')  # Пароль от вашего почтового ящика mail.ru
+# Письма ставятся в очередь EmailOutbox и отправляются командой run_email_dispatcher
+EMAIL_OUTBOX = {
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 5,
+    # Задержка перед повторной отправкой в секундах, удваивается с каждой попыткой
+    'RETRY_DELAY': 30,
+    'MAX_RETRY_DELAY': 3600,
+    # Сколько секунд захваченное письмо недоступно другим обработчикам, пока идет отправка
+    'LEASE': 300,
+}
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication'
+        'api.authentication.SignedTokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 40,
-}
\ No newline at end of file
+}
+
+# Библиотека JSON для ответов и разбора запросов: auto (orjson, затем ujson), orjson, ujson или json
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+
+# Количество товаров в одном пакете при импорте прайс-листа магазина
+CATALOG_IMPORT_BATCH_SIZE = int(os.getenv('CATALOG_IMPORT_BATCH_SIZE', 1000))
+
+# Количество товаров, читаемых из базы за один раз при выгрузке каталога
+CATALOG_EXPORT_CHUNK_SIZE = int(os.getenv('CATALOG_EXPORT_CHUNK_SIZE', 2000))
+
+# Кэши. Прогресс задач импорта (manage.py run_import_worker) хранится в файловом кэше,
+# общем для веб-процессов и обработчиков на одном сервере
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'import_progress': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('IMPORT_PROGRESS_CACHE_LOCATION',
+                              os.path.join(tempfile.gettempdir(), 'api_test_import_progress')),
+    },
+    # Кэш ответов каталога (api.cache.CatalogCacheMixin). LocMemCache вытесняет записи по LRU,
+    # для общего кэша между процессами подходят FileBasedCache или DatabaseCache (manage.py createcachetable)
+    'catalog': {
+        'BACKEND': os.getenv('CATALOG_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CATALOG_CACHE_LOCATION', 'catalog'),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', 1000)),
+        },
+    },
+    # Снимки пользователей по токену (api.authentication.CachedTokenAuthentication).
+    # В рабочем окружении нужен кэш, общий для всех процессов и серверов: RedisCache или PyMemcacheCache.
+    # LocMemCache по умолчанию виден только своему процессу, выход и смена пароля сбрасывают его записи
+    # лишь в обработавшем запрос процессе, поэтому снимки в нем живут не дольше AUTH_TOKEN_CACHE['LOCAL_TIMEOUT']
+    'auth': {
+        'BACKEND': os.getenv('AUTH_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('AUTH_CACHE_LOCATION', 'auth'),
+        'TIMEOUT': int(os.getenv('AUTH_CACHE_TIMEOUT', 300)),
+    },
+    # Закрепления пользователей за основной базой после записи (api.db.ReplicaPinningMiddleware).
+    # Кэш должен быть общим для всех процессов, по умолчанию таблица в основной базе, которую создает
+    # миграция api.0006_replica_pin_cache_table (после смены REPLICA_PIN_CACHE_LOCATION: manage.py createcachetable).
+    # В рабочем окружении лучше RedisCache или PyMemcacheCache
+    'replica_pin': {
+        'BACKEND': os.getenv('REPLICA_PIN_CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.getenv('REPLICA_PIN_CACHE_LOCATION', 'api_replica_pin'),
+    },
+    # Корзины ограничения попыток входа (api.throttling). По умолчанию LocMemCache: попытки не пишутся в базу,
+    # но лимит действует в каждом процессе отдельно и вместе умножается на их число.
+    # Для общего лимита подходят RedisCache или PyMemcacheCache (THROTTLE_CACHE_BACKEND и THROTTLE_CACHE_LOCATION)
+    'throttle': {
+        'BACKEND': os.getenv('THROTTLE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('THROTTLE_CACHE_LOCATION', 'throttle'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+IMPORT_PROGRESS_CACHE = 'import_progress'
+IMPORT_JOB_TIMEOUT = int(os.getenv('IMPORT_JOB_TIMEOUT', 3600))
+IMPORT_JOB_CLAIM_CANDIDATES = 20
+
+# Ограничение попыток входа и регистрации: запас попыток и пополнение в минуту для IP и для email.
+# За обратными прокси IP клиента берется из CLIENT_IP_HEADER, который дописывают TRUSTED_PROXIES доверенных прокси,
+# без прокси TRUSTED_PROXIES = 0 и используется REMOTE_ADDR
+LOGIN_THROTTLE = {
+    'CACHE': 'throttle',
+    'CLIENT_IP_HEADER': os.getenv('LOGIN_THROTTLE_CLIENT_IP_HEADER', 'X-Forwarded-For'),
+    'TRUSTED_PROXIES': int(os.getenv('LOGIN_THROTTLE_TRUSTED_PROXIES', 0)),
+    'IP_BURST': int(os.getenv('LOGIN_THROTTLE_IP_BURST', 20)),
+    'IP_PER_MINUTE': float(os.getenv('LOGIN_THROTTLE_IP_PER_MINUTE', 10)),
+    'EMAIL_BURST': int(os.getenv('LOGIN_THROTTLE_EMAIL_BURST', 5)),
+    'EMAIL_PER_MINUTE': float(os.getenv('LOGIN_THROTTLE_EMAIL_PER_MINUTE', 2)),
+}
+
+# Подписанные токены (api.tokens): срок жизни токена доступа и refresh-токена в секундах
+SIGNED_TOKENS = {
+    'SIGNING_KEY': os.getenv('TOKEN_SIGNING_KEY', SECRET_KEY),
+    'ACCESS_LIFETIME': int(os.getenv('ACCESS_TOKEN_LIFETIME', 5 * 60)),
+    'REFRESH_LIFETIME': int(os.getenv('REFRESH_TOKEN_LIFETIME', 14 * 24 * 60 * 60)),
+}
+
+# Кэш аутентификации по токену: LRU процесса перед общим кэшем. Записи в других процессах
+# не сбрасываются при выходе или смене пароля и живут не дольше LOCAL_TIMEOUT секунд
+AUTH_TOKEN_CACHE = {
+    'CACHE': 'auth',
+    'LOCAL_MAX_ENTRIES': int(os.getenv('AUTH_LOCAL_CACHE_MAX_ENTRIES', 10000)),
+    'LOCAL_TIMEOUT': float(os.getenv('AUTH_LOCAL_CACHE_TIMEOUT', 10)),
+}
+
+# Скачивание прайс-листов: размер читаемой части ответа и объем, который держится в памяти до записи на диск
+FEED_CHUNK_SIZE = 64 * 1024
+FEED_SPOOL_MAX_MEMORY = int(os.getenv('FEED_SPOOL_MAX_MEMORY', 8 * 1024 * 1024))
+FEED_FETCH = {
+    'CONNECT_TIMEOUT': float(os.getenv('FEED_CONNECT_TIMEOUT', 5)),
+    'READ_TIMEOUT': float(os.getenv('FEED_READ_TIMEOUT', 30)),
+    'RETRIES': int(os.getenv('FEED_RETRIES', 3)),
+    'BACKOFF_FACTOR': 0.5,
+    'MAX_BYTES': int(os.getenv('FEED_MAX_BYTES', 1024 * 1024 * 1024)),
+    # Количество хостов, для которых хранится пул соединений, и размер пула на один хост
+    'POOL_CONNECTIONS': 10,
+    'POOL_MAXSIZE': int(os.getenv('FEED_POOL_MAXSIZE', 4)),
+}
+
+# Поисковый индекс каталога: api.search.SQLiteFTSBackend (FTS5, только для SQLite),
+# api.search.PostgreSQLSearchBackend (tsvector и GIN, только для PostgreSQL), по умолчанию выбирается по DB_ENGINE.
+# api.search.DatabaseSearchBackend работает с любой базой, но просматривает весь каталог на каждый запрос
+CATALOG_SEARCH_BACKEND = os.getenv('CATALOG_SEARCH_BACKEND', 'api.search.SQLiteFTSBackend' if DB_ENGINE == 'sqlite'
+                                   else 'api.search.PostgreSQLSearchBackend')
+SEARCH_MAX_LIMIT = 100
+
+# Время хранения ответов на запросы с заголовком Idempotency-Key в секундах.
+# Устаревшие ключи удаляются командой prune_idempotency_keys
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+# Опрос новых заказов магазина (api/v1/shop/orders/?since=): заказы, измененные позже чем столько секунд назад,
+# откладываются до следующего опроса, чтобы курсор не обогнал еще не завершенные транзакции оформления
+SHOP_ORDERS_POLL_DELAY = int(os.getenv('SHOP_ORDERS_POLL_DELAY', 5))